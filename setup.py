@@ -75,6 +75,7 @@ setup(
        'ocr': ['rapidocr-onnxruntime'],
        'ai': ['openai', 'langchain-community', 'langchain-unstructured'],
        'pdf': ['pdf2image', 'pypdf', 'Pillow'],
+       'archive': ['py7zr'],
     },
     entry_points={
         'console_scripts': [
@@ -0,0 +1,395 @@
+import asyncio
+import contextvars
+import os
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from loguru import logger
+
+from spider_tools.file_download import FileDownloader, DownloadBatch, NotPdfError
+from spider_tools.file_utils import (
+    clean_name,
+    start_detect_file_type,
+    convert_doc_to_docx_from_url,
+    process_archive,
+    ARCHIVE_TYPES,
+)
+from spider_tools.utils import calculate_md5
+
+
+class RateLimiter:
+    """令牌桶限速：全局每秒最多发起 rate 个请求，rate 为 0 表示不限速"""
+
+    def __init__(self, rate=0, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _TaskLocal:
+    """threading.local 的协程版：每个 asyncio 任务各自一份（contextvars），记录下载尝试次数、错误等统计"""
+
+    def __init__(self):
+        object.__setattr__(self, '_var', contextvars.ContextVar('download_state'))
+
+    def reset(self, **values):
+        # 子任务继承的是父任务的同一个字典，开始下载前换成新的，避免并发任务互相覆盖
+        self._var.set(dict(values))
+
+    def _state(self):
+        state = self._var.get(None)
+        if state is None:
+            state = {}
+            self._var.set(state)
+        return state
+
+    def __getattr__(self, name):
+        try:
+            return self._state()[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self._state()[name] = value
+
+
+class AsyncFileDownloader(FileDownloader):
+    """
+    基于 aiohttp 的异步文件下载器：与 FileDownloader 接口一致（download/download_bytes/download_many/probe/
+    is_valid_pdf/get_file），同一事件循环内复用连接池，支持总连接数、单主机并发与全局限速。
+    落盘下载同样写 .part 并用 Range + If-Range 断点续传（不做分段并发），require_pdf 在下载流上校验。
+
+    用法：
+        async with AsyncFileDownloader(per_host_limit=4, rate_limit=20) as downloader:
+            ok, path = await downloader.download(url, save_dir="files")
+            async for result in downloader.download_many(urls, save_dir="files"):
+                print(result["url"], result["ok"])
+    """
+
+    def __init__(self, *args, max_connections=100, per_host_limit=8, rate_limit=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_connections = max_connections
+        self.per_host_limit = per_host_limit
+        self.rate_limit = rate_limit
+        self._session = None
+        self._limiter = None
+        self._local = _TaskLocal()
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.per_host_limit,
+                ssl=None if self.verify_ssl else False,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._limiter = RateLimiter(self.rate_limit)
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _proxy(self, url):
+        """aiohttp 每个请求只接受一个代理，按 URL 协议从 requests 风格的 proxies 中选取"""
+        return self.proxies.get(urlparse(url).scheme) or self.proxies.get('all') or None
+
+    async def _request(self, method, url, **kwargs):
+        session = await self._get_session()
+        await self._limiter.acquire()
+        return session.request(method, url, proxy=self._proxy(url), **kwargs)
+
+    async def _retry(self, func, *args, max_retries=None):
+        """与 utils.retry 一致：重试 max_retries 次，全部失败时记录日志并返回 None"""
+        max_retries = max_retries or self.retry_times
+        last_exception = None
+        for retry_count in range(max_retries):
+            try:
+                return await func(*args)
+            except Exception as e:
+                last_exception = e
+                if retry_count < max_retries - 1:
+                    await asyncio.sleep(self.retry_delay)
+        logger.error(f"{func.__name__} 执行失败，{max_retries} 次重试后失败，原因: {last_exception}")
+        return None
+
+    async def _head(self, url):
+        try:
+            async with await self._request(
+                    'HEAD', url, allow_redirects=True,
+                    timeout=aiohttp.ClientTimeout(total=min(15, self.timeout))
+            ) as resp:
+                resp.raise_for_status()
+                return resp
+        except Exception as e:
+            logger.warning(f"HEAD探测失败{url}：{e}")
+            return None
+
+    async def _stream_download_once(self, url, save_path, require_pdf=False):
+        """与 FileDownloader._stream_download 相同：先写 .part，出错时保留 .part/.part.json 供断点续传"""
+        self._attempt()
+        part_path, meta_path = save_path + ".part", save_path + ".part.json"
+        try:
+            meta = self._load_part_meta(url, meta_path)
+            # 同步分段下载留下的进度异步版不接续，从头下载
+            await self._resume_download(url, part_path, meta_path, None if meta and meta.get('segments') else meta,
+                                        require_pdf)
+            if require_pdf and self._local.saved_requests == 0:
+                # 断点续传时没有从头读到文件头，落盘后补校验
+                with open(part_path, 'rb') as f:
+                    self._check_pdf(None, f.read(5))
+            size = os.path.getsize(part_path)
+            if size < self.min_valid_size:
+                self._remove_part(part_path, meta_path)
+                raise Exception(f"下载文件过小（{size}字节），判定为损坏")
+            os.replace(part_path, save_path)
+            self._remove_part(meta_path)
+            return True, f"下载成功（保存路径：{save_path}）"
+        except NotPdfError as e:
+            self._remove_part(part_path, meta_path)
+            return False, str(e)
+        except Exception as e:
+            self._local.error = str(e)
+            raise e
+
+    async def _resume_download(self, url, part_path, meta_path, meta, require_pdf=False):
+        headers = {}
+        offset = os.path.getsize(part_path) if meta and os.path.exists(part_path) else 0
+        validator = meta and (meta.get('etag') or meta.get('last_modified'))
+        if offset and validator and offset == meta.get('length'):
+            logger.info(f"[{url}] .part 已完整（{offset}字节），直接完成")
+            return
+        if offset and validator:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+        async with await self._request('GET', url, headers=headers) as resp:
+            if resp.status == 416 and 'Range' in headers:
+                total = resp.headers.get('Content-Range', '').rpartition('/')[2]
+                if not total.isdigit() or int(total) == offset:
+                    logger.info(f"[{url}] .part 已完整（{offset}字节），直接完成")
+                    return
+                self._remove_part(part_path, meta_path)
+                raise Exception(f"断点（{offset}字节）超出服务器文件长度（{total}字节），将重新下载")
+            resp.raise_for_status()
+            content_range = resp.headers.get('Content-Range', '')
+            if resp.status == 206 and content_range.startswith(f"bytes {offset}-"):
+                logger.info(f"[{url}] 从 {offset} 字节处断点续传")
+                mode = 'ab'
+            else:
+                meta = self._part_meta(url, resp)
+                mode = 'wb'
+            first = await resp.content.read(self.chunk_size)
+            if require_pdf and mode == 'wb':
+                self._check_pdf(resp, first)
+            if mode == 'wb':
+                self._save_part_meta(meta_path, meta)
+            with open(part_path, mode) as f:
+                f.write(first)
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+        size = os.path.getsize(part_path)
+        if meta.get('length') and size != meta['length']:
+            raise Exception(f"下载不完整（{size}/{meta['length']}字节），将断点续传")
+
+    async def _stream_download(self, url, save_path, require_pdf=False):
+        return await self._retry(self._stream_download_once, url, save_path, require_pdf, max_retries=3)
+
+    async def _get_bytes_once(self, url, require_pdf=False):
+        self._attempt()
+        async with await self._request('GET', url) as resp:
+            resp.raise_for_status()
+            if require_pdf:
+                first = await resp.content.read(self.chunk_size)
+                try:
+                    self._check_pdf(resp, first)
+                except NotPdfError as e:
+                    # 返回 None 而不是抛异常，避免重复请求
+                    self._local.error = str(e)
+                    return None
+                content = first + await resp.read()
+            else:
+                content = await resp.read()
+            if len(content) < self.min_valid_size:
+                raise Exception(f"下载内容过小（{len(content)}字节）")
+            return content
+
+    async def _get_bytes(self, url, require_pdf=False):
+        return await self._retry(self._get_bytes_once, url, require_pdf, max_retries=2)
+
+    async def probe(self, url):
+        head_resp = await self._head(url)
+        info = {
+            'status': None,
+            'content_type': None,
+            'content_length': None,
+            'headers': {}
+        }
+        if head_resp is not None:
+            info['status'] = head_resp.status
+            info['content_type'] = (head_resp.headers.get('Content-Type') or '').lower()
+            info['content_length'] = head_resp.headers.get('Content-Length')
+            info['headers'] = dict(head_resp.headers)
+        return info
+
+    async def is_valid_pdf(self, url):
+        """PDF 合法性校验（HEAD + 文件头魔数）"""
+        try:
+            head_resp = await self._head(url)
+            if head_resp is not None:
+                ctype = (head_resp.headers.get('Content-Type') or '').lower()
+                if 'application/pdf' in ctype:
+                    return True
+            async with await self._request(
+                    'GET', url, timeout=aiohttp.ClientTimeout(total=min(30, self.timeout))
+            ) as resp:
+                resp.raise_for_status()
+                first5 = await resp.content.read(5)
+                return first5.startswith(self.PDF_MAGIC_NUMBER)
+        except Exception as e:
+            logger.error(f"PDF校验失败（{url}）：{e}")
+            return False
+
+    async def download(self, url, save_to_disk=True, save_dir=None, file_name=None, require_pdf=False):
+        """与 FileDownloader.download 相同的语义与返回值：(ok, save_path) 或 (ok, bytes)"""
+        self._local.reset(attempts=0, error=None, saved_requests=0)
+        try:
+            if not self.is_downloadable_url(url):
+                raise Exception("不合法的下载链接或被过滤的后缀")
+            if not save_to_disk:
+                content = await self._get_bytes(url, require_pdf)
+                if not content:
+                    raise Exception(self._local.error or "下载失败")
+                return True, content
+
+            save_path = self.get_save_path(url, save_dir, file_name)
+            skip, msg = self.check_file_exist(save_path)
+            if skip:
+                if require_pdf:
+                    with open(save_path, 'rb') as f:
+                        if not f.read(5).startswith(self.PDF_MAGIC_NUMBER):
+                            raise Exception("已存在的文件不是PDF，PDF校验不通过")
+                logger.info(f"[{url}] {msg}")
+                return True, save_path
+            result = await self._stream_download(url, save_path, require_pdf)
+            if not result:
+                raise Exception(self._local.error or "下载失败")
+            success, msg = result
+            if success:
+                logger.success(f"[{url}] {msg}")
+                return True, save_path
+            raise Exception(msg)
+        except Exception as e:
+            logger.error(f"[{url}] 下载处理异常：{str(e)}")
+            self._local.error = str(e)
+            return False, None
+
+    async def download_bytes(self, url, require_pdf=False):
+        return await self.download(url, save_to_disk=False, require_pdf=require_pdf)
+
+    def download_many(self, urls, save_to_disk=True, save_dir=None, require_pdf=False,
+                      max_workers=8, per_host=4):
+        """
+        与 FileDownloader.download_many 相同的调度与统计，返回 AsyncDownloadBatch，用 async for 读取结果：
+
+            batch = downloader.download_many(urls, save_dir="files", max_workers=16, per_host=4)
+            async for result in batch:
+                print(result["url"], result["ok"], result["path"])
+            print(batch.stats)
+        """
+        return AsyncDownloadBatch(self, urls, save_to_disk=save_to_disk, save_dir=save_dir,
+                                  require_pdf=require_pdf, max_workers=max_workers, per_host=per_host)
+
+    async def check_file(self, title, url=None, content=None):
+        """下载/或接收内容 → 识别类型 → doc→docx → md5 命名，返回 (content, ext, name)"""
+        if content is None:
+            ok, content = await self.download_bytes(url)
+            if not ok or not content:
+                raise Exception("下载失败")
+            # 直接用下载到的内容识别类型，不再单独请求
+            ext = start_detect_file_type(url, title, content)
+        else:
+            ext = start_detect_file_type(file_url=None, file_name=title)
+
+        if ext == "doc":
+            content = await asyncio.to_thread(convert_doc_to_docx_from_url, url or '', content)
+            ext = "docx"
+
+        md5 = calculate_md5(content)
+        name = md5 + "." + ext
+        return content, ext, name
+
+    async def get_file(self, url, title, **archive_options):
+        """根据 url 获取文件；若为压缩包则展开并并行规范化成员（archive_options 见 process_archive）"""
+        content, ext, name = await self.check_file(title=title, url=url)
+        if ext in ARCHIVE_TYPES:
+            return await asyncio.to_thread(process_archive, content, name, ext, **archive_options)
+        return [(content, name)]
+
+
+class AsyncDownloadBatch(DownloadBatch):
+    """DownloadBatch 的协程版：同样按主机轮转调度，max_workers/per_host 限制同时运行的下载任务数"""
+
+    async def _run(self, url, file_name):
+        start = time.time()
+        if self.save_to_disk:
+            ok, data = await self.downloader.download(url, save_dir=self.save_dir, file_name=file_name,
+                                                      require_pdf=self.require_pdf)
+        else:
+            ok, data = await self.downloader.download_bytes(url, require_pdf=self.require_pdf)
+        return self._result(url, ok, data, start)
+
+    def __iter__(self):
+        raise TypeError("AsyncFileDownloader.download_many 需要用 async for 读取结果")
+
+    async def __aiter__(self):
+        start = time.time()
+        skipped, hosts = self._plan()
+        for result in skipped:
+            yield result
+        active = {host: 0 for host in hosts}
+        running = {}
+        try:
+            while hosts or running:
+                self._schedule(hosts, active, running,
+                               lambda url, file_name: asyncio.ensure_future(self._run(url, file_name)))
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    active[running.pop(task)] -= 1
+                    result = task.result()
+                    self._record(result)
+                    yield result
+        finally:
+            # 提前退出 async for 时取消未完成的下载
+            for task in running:
+                task.cancel()
+        self._finish(start)
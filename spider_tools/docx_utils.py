@@ -10,6 +10,8 @@ import pythoncom
 import win32com.client
 import requests
 
+from spider_tools.download_cache import cached_convert
+
 def to_docx(doc_bytes: bytes) -> bytes:
     """
     输入: DOC 的二进制内容（bytes）
@@ -17,7 +19,12 @@ def to_docx(doc_bytes: bytes) -> bytes:
 
     - Windows + Office 可用时：使用 Word COM 高保真转换
     - 否则：自动降级为纯文本方案（仅保留文本）
+    - 已开启转换缓存时，相同内容的 DOC 直接返回上次的转换结果
     """
+    return cached_convert(doc_bytes, "docx:word", lambda: _word_to_docx(doc_bytes))
+
+
+def _word_to_docx(doc_bytes: bytes) -> bytes:
     with tempfile.TemporaryDirectory() as tmpdir:
         doc_path = Path(tmpdir) / "input.doc"
         out_docx_path = Path(tmpdir) / "output.docx"
@@ -274,6 +281,7 @@ def convert_doc_to_docx_pure(doc_path: str, out_docx_path: str) -> str:
     - 方法：读取二进制内容，按 'latin-1' / 'gbk' 兼容方式尽力提取文本，
       然后用 python-docx 生成简易 docx（仅保留纯文本）。
     - 注意：这是降级方案，格式/表格/图片将丢失。
+    - 已开启转换缓存时，相同内容的 .doc 直接写出上次的转换结果。
     返回生成的 docx 路径。
     """
     base_dir = os.path.dirname(out_docx_path)
@@ -282,6 +290,14 @@ def convert_doc_to_docx_pure(doc_path: str, out_docx_path: str) -> str:
 
     with open(doc_path, 'rb') as f:
         raw = f.read()
+    docx_bytes = cached_convert(raw, "docx:text", lambda: _text_to_docx(raw))
+    with open(out_docx_path, 'wb') as f:
+        f.write(docx_bytes)
+    logger.warning(".doc 转换采用纯文本降级方案，格式已丢失: {} -> {}", doc_path, out_docx_path)
+    return out_docx_path
+
+
+def _text_to_docx(raw: bytes) -> bytes:
     # 尝试多种解码获取最大化文本
     text = None
     for enc in ('utf-8', 'gbk', 'latin-1'):  # 宽松策略
@@ -297,9 +313,9 @@ def convert_doc_to_docx_pure(doc_path: str, out_docx_path: str) -> str:
     docx = Document()
     for line in re.split(r"[\r\n]+", text):
         docx.add_paragraph(line)
-    docx.save(out_docx_path)
-    logger.warning(".doc 转换采用纯文本降级方案，格式已丢失: {} -> {}", doc_path, out_docx_path)
-    return out_docx_path
+    buffer = BytesIO()
+    docx.save(buffer)
+    return buffer.getvalue()
 
 
 def collect_docx_files_pure(src_dir: str, dest_dir: str) -> None:
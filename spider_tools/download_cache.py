@@ -0,0 +1,430 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+from loguru import logger
+from requests.structures import CaseInsensitiveDict
+
+
+class DownloadCache:
+    """
+    内容寻址的本地下载缓存，FileDownloader、file_utils、OSSManager 共用：
+    - 索引（sqlite）以 URL 为键，指向按 MD5 命名的内容文件 blobs/<md5[:2]>/<md5>，相同内容只存一份
+    - 新鲜度取 Cache-Control: max-age（no-cache 视为立即过期，no-store 不缓存），且不超过 ttl（None 为不限时）
+    - 过期但带 ETag/Last-Modified 的条目发条件请求重新验证，304 时直接使用本地内容
+    - 内容总大小超过 max_size 时按最近访问时间（LRU）淘汰
+    """
+
+    def __init__(self, cache_dir=".download_cache", max_size=2 * 1024 ** 3, ttl=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+        os.makedirs(os.path.join(cache_dir, "blobs"), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), timeout=30, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "url TEXT PRIMARY KEY, md5 TEXT, size INTEGER, headers TEXT, etag TEXT, last_modified TEXT, "
+            "stored_at REAL, fresh_until REAL, last_access REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_md5 ON entries (md5)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_access ON entries (last_access)")
+        self.db.commit()
+
+    def blob_path(self, md5):
+        return os.path.join(self.cache_dir, "blobs", md5[:2], md5)
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def hit_rate(self):
+        """只读计数器，不查询索引"""
+        with self.lock:
+            hits, misses = self.counters['hits'], self.counters['misses']
+        return round(hits / (hits + misses), 4) if hits + misses else 0.0
+
+    def stats(self):
+        """命中/未命中等计数，以及当前条目数与内容总大小"""
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = self._total_size()
+            stats = dict(self.counters, entries=entries, size=size)
+        stats['hit_rate'] = self.hit_rate()
+        return stats
+
+    def _total_size(self):
+        row = self.db.execute("SELECT SUM(size) FROM (SELECT MAX(size) AS size FROM entries GROUP BY md5)").fetchone()
+        return row[0] or 0
+
+    def _entry(self, url):
+        row = self.db.execute(
+            "SELECT md5, size, headers, etag, last_modified, stored_at, fresh_until FROM entries WHERE url = ?",
+            (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('md5', 'size', 'headers', 'etag', 'last_modified', 'stored_at', 'fresh_until')
+        entry = dict(zip(keys, row))
+        if not os.path.exists(self.blob_path(entry['md5'])):
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self.db.commit()
+            return None
+        return entry
+
+    def lookup(self, url):
+        """返回 (条目, 是否新鲜)；不存在返回 (None, False)"""
+        with self.lock:
+            entry = self._entry(url)
+            if entry is None:
+                return None, False
+            now = time.time()
+            fresh = now < entry['fresh_until'] and (self.ttl is None or now < entry['stored_at'] + self.ttl)
+            if fresh:
+                self.db.execute("UPDATE entries SET last_access = ? WHERE url = ?", (now, url))
+                self.db.commit()
+            return entry, fresh
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _freshness(self, headers):
+        """按 Cache-Control 计算新鲜期（秒），返回 None 表示不可缓存"""
+        cache_control = (headers.get('Cache-Control') or '').lower()
+        directives = [d.strip() for d in cache_control.split(',') if d.strip()]
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0
+        for directive in directives:
+            if directive.startswith('max-age='):
+                try:
+                    max_age = int(directive.split('=', 1)[1])
+                    return max_age if self.ttl is None else min(max_age, self.ttl)
+                except ValueError:
+                    break
+        return math.inf if self.ttl is None else self.ttl
+
+    def refresh(self, url, headers):
+        """条件请求得到 304：更新新鲜期后继续使用本地内容"""
+        freshness = self._freshness(headers)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "UPDATE entries SET stored_at = ?, fresh_until = ?, last_access = ? WHERE url = ?",
+                (now, now + (freshness or 0), now, url)
+            )
+            self.db.commit()
+        self._count('revalidated')
+
+    def store_file(self, url, tmp_path, md5, size, headers):
+        """把已写好的临时文件登记为 url 的内容（tmp_path 会被移动或删除）"""
+        freshness = self._freshness(headers)
+        if freshness is None:
+            os.remove(tmp_path)
+            return
+        blob = self.blob_path(md5)
+        now = time.time()
+        keep = {k: headers[k] for k in ('Content-Type', 'Content-Disposition') if k in headers}
+        with self.lock:
+            # 放置内容与登记索引在同一把锁内，避免与淘汰并发时删掉刚复用的内容文件
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if os.path.exists(blob):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, blob)
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, md5, size, json.dumps(keep), headers.get('ETag'), headers.get('Last-Modified'),
+                 now, now + freshness, now)
+            )
+            self.db.commit()
+            self._evict()
+        self._count('stores')
+
+    def store(self, url, content, headers):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        self.store_file(url, tmp_path, hashlib.md5(content).hexdigest(), len(content), headers)
+
+    def _evict(self):
+        """需持有锁：先清理超过 ttl 且无法重新验证的条目，再按 LRU 淘汰到 max_size 以内"""
+        if self.ttl is not None:
+            rows = self.db.execute(
+                "SELECT url, md5 FROM entries WHERE stored_at < ? AND etag IS NULL AND last_modified IS NULL",
+                (time.time() - self.ttl,)
+            ).fetchall()
+            for url, md5 in rows:
+                self._remove(url, md5)
+        total = self._total_size()
+        if total > self.max_size:
+            rows = self.db.execute("SELECT url, md5, size FROM entries ORDER BY last_access").fetchall()
+            for url, md5, size in rows:
+                if total <= self.max_size:
+                    break
+                if self._remove(url, md5):
+                    total -= size
+        self.db.commit()
+
+    def _remove(self, url, md5):
+        """删除条目，内容不再被其他 URL 引用时一并删除，返回是否删除了内容文件"""
+        self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+        self.counters['evictions'] += 1
+        if self.db.execute("SELECT 1 FROM entries WHERE md5 = ? LIMIT 1", (md5,)).fetchone() is not None:
+            return False
+        try:
+            os.remove(self.blob_path(md5))
+        except FileNotFoundError:
+            pass
+        return True
+
+    def clear(self):
+        with self.lock:
+            for (md5,) in self.db.execute("SELECT DISTINCT md5 FROM entries").fetchall():
+                try:
+                    os.remove(self.blob_path(md5))
+                except FileNotFoundError:
+                    pass
+            self.db.execute("DELETE FROM entries")
+            self.db.commit()
+
+    def get(self, url, get=None, **kwargs):
+        """
+        带缓存的 GET，返回与 requests.Response 用法一致的对象（content/headers/url/iter_content/raise_for_status）。
+        新鲜命中完全不发请求；过期条目发条件请求，304 时使用本地内容；其余情况发正常请求并写入缓存。
+        """
+        get = get or requests.get
+        entry, fresh = self.lookup(url)
+        if fresh:
+            self._count('hits')
+            return CachedResponse(url, self.blob_path(entry['md5']), entry['headers'])
+        headers = dict(kwargs.pop('headers', None) or {})
+        headers.update(self.conditional_headers(entry))
+        response = get(url, headers=headers, **kwargs)
+        if entry is not None and response.status_code == 304:
+            response.close()
+            self.refresh(url, response.headers)
+            self._count('hits')
+            return CachedResponse(url, self.blob_path(entry['md5']), entry['headers'])
+        self._count('misses')
+        if response.status_code != 200:
+            return response
+        if kwargs.get('stream'):
+            return TeeResponse(response, self, url)
+        self.store(url, response.content, response.headers)
+        return response
+
+
+class CachedResponse:
+    """缓存命中时返回的响应对象，内容从本地 blob 按需读取"""
+
+    status_code = 200
+    ok = True
+
+    def __init__(self, url, path, headers):
+        self.url = url
+        self.path = path
+        self.headers = CaseInsensitiveDict(json.loads(headers or '{}'))
+        self.from_cache = True
+        self._content = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1024 * 1024, decode_unicode=False):
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size or 1024 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+
+    @property
+    def content(self):
+        if self._content is None:
+            with open(self.path, 'rb') as f:
+                self._content = f.read()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(requests.utils.get_encoding_from_headers(self.headers) or 'utf-8',
+                                   errors='replace')
+
+
+class TeeResponse:
+    """未命中的流式响应：调用方读取分块的同时写入缓存临时文件，完整读完后登记到缓存"""
+
+    def __init__(self, response, cache, url):
+        self._response = response
+        self._cache = cache
+        self._url = url
+        self._content = None
+        self.from_cache = False
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._response.close()
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=self._cache.cache_dir)
+        md5 = hashlib.md5()
+        size = 0
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self._response.iter_content(chunk_size=chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        md5.update(chunk)
+                        size += len(chunk)
+                    yield chunk
+            completed = True
+        finally:
+            if completed:
+                try:
+                    self._cache.store_file(self._url, tmp_path, md5.hexdigest(), size, self._response.headers)
+                except Exception as e:
+                    logger.warning(f"写入下载缓存失败（{self._url}）：{e}")
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b"".join(self.iter_content(1024 * 1024))
+        return self._content
+
+
+class ConversionCache(DownloadCache):
+    """
+    文档转换结果缓存：以 "转换方式 + 源内容 MD5" 为键，复用 DownloadCache 的内容文件存储与按总大小的 LRU 淘汰。
+    转换结果不随时间过期，只按大小淘汰；stats() 中的 hits/misses/hit_rate 即转换缓存命中率
+    """
+
+    def __init__(self, cache_dir=".convert_cache", max_size=1024 ** 3):
+        super().__init__(cache_dir, max_size=max_size, ttl=None)
+
+    @staticmethod
+    def _key(source_md5, target):
+        return f"convert:{target}:{source_md5}"
+
+    def load(self, source_md5, target):
+        """命中返回转换结果字节（同时刷新访问时间），否则返回 None"""
+        entry, _ = self.lookup(self._key(source_md5, target))
+        try:
+            if entry is not None:
+                with open(self.blob_path(entry['md5']), 'rb') as f:
+                    content = f.read()
+                self._count('hits')
+                return content
+        except FileNotFoundError:
+            pass
+        self._count('misses')
+        return None
+
+    def save(self, source_md5, target, content):
+        self.store(self._key(source_md5, target), content, {})
+
+
+_default_cache = None
+_conversion_cache = None
+
+
+def enable_download_cache(cache_dir=".download_cache", max_size=2 * 1024 ** 3, ttl=7 * 24 * 3600):
+    """开启进程内共享的下载缓存（设置环境变量 SPIDER_TOOLS_CACHE_DIR 时自动开启）"""
+    global _default_cache
+    _default_cache = DownloadCache(cache_dir, max_size=max_size, ttl=ttl)
+    return _default_cache
+
+
+def disable_download_cache():
+    global _default_cache
+    _default_cache = None
+
+
+def get_download_cache():
+    return _default_cache
+
+
+def cached_get(url, get=None, cache=None, **kwargs):
+    """已开启缓存时走缓存，否则等同于 requests.get"""
+    cache = cache or _default_cache
+    if cache is None:
+        return (get or requests.get)(url, **kwargs)
+    return cache.get(url, get=get, **kwargs)
+
+
+def enable_conversion_cache(cache_dir=".convert_cache", max_size=1024 ** 3):
+    """开启进程内共享的转换结果缓存（设置环境变量 SPIDER_TOOLS_CONVERT_CACHE_DIR 时自动开启）"""
+    global _conversion_cache
+    _conversion_cache = ConversionCache(cache_dir, max_size=max_size)
+    return _conversion_cache
+
+
+def disable_conversion_cache():
+    global _conversion_cache
+    _conversion_cache = None
+
+
+def get_conversion_cache():
+    return _conversion_cache
+
+
+def cached_convert(source, target, convert, cache=None):
+    """
+    先按源内容 MD5 查转换缓存，命中直接返回；未命中时调用 convert() 并缓存非空结果。
+    target 区分转换方式（如 "docx:soffice"），未开启缓存时等同于直接调用 convert()
+    """
+    cache = cache or _conversion_cache
+    if cache is None:
+        return convert()
+    source_md5 = hashlib.md5(source).hexdigest()
+    content = cache.load(source_md5, target)
+    if content is not None:
+        logger.info(f"转换缓存命中（{target}），命中率 {cache.hit_rate():.1%}")
+        return content
+    content = convert()
+    if content:
+        try:
+            cache.save(source_md5, target, content)
+        except Exception as e:
+            logger.warning(f"写入转换缓存失败：{e}")
+    return content
+
+
+if os.environ.get("SPIDER_TOOLS_CACHE_DIR"):
+    enable_download_cache(os.environ["SPIDER_TOOLS_CACHE_DIR"])
+
+if os.environ.get("SPIDER_TOOLS_CONVERT_CACHE_DIR"):
+    enable_conversion_cache(os.environ["SPIDER_TOOLS_CONVERT_CACHE_DIR"])
@@ -1,22 +1,34 @@
+import json
 import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import requests
 from loguru import logger
 from spider_tools.utils import retry, calculate_md5
 import urllib.parse
 import ftfy
-import magic
 from spider_tools.file_utils import (
     clean_name,
     get_filename_from_response,
     start_detect_file_type,
-    extract_archive,
-    # convert_doc_to_docx_from_url,
+    stream_to_result,
+    cached_get,
+    sniff_url_type,
+    process_archive,
+    ARCHIVE_TYPES,
+    convert_doc_to_docx_from_url,
 )
 
 # 忽略SSL警告（如需强制关闭校验，可在实例化时传入 verify_ssl=False）
 requests.packages.urllib3.disable_warnings()
 
     
+class NotPdfError(Exception):
+    """require_pdf 校验不通过，不再重试"""
+
+
 class FileDownloader:
     """
     通用文件下载器：支持HEAD探测、分块下载、重试、最小大小校验、文件名推断、返回字节或文件
@@ -33,6 +45,9 @@ class FileDownloader:
             timeout=60,
             verify_ssl=True,
             deny_extensions=None,
+            segments=1,
+            segment_min_size=16 * 1024 * 1024,
+            cache=None,
     ):
         self.default_headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36",
@@ -46,11 +61,21 @@ class FileDownloader:
         self.min_valid_size = min_valid_size
         self.timeout = timeout
         self.verify_ssl = verify_ssl
+        # 分段并发下载：服务器支持 Range 且文件不小于 segment_min_size 时，同时拉取 segments 段
+        self.segments = max(1, segments)
+        self.segment_min_size = segment_min_size
+        # 下载缓存（DownloadCache），为空时使用 enable_download_cache 开启的全局缓存，都没有则不缓存
+        self.cache = cache
         self.PDF_MAGIC_NUMBER = b"%PDF-"
         # 不下载的后缀（可扩展）
         self.deny_extensions = set((deny_extensions or [
             '.html', '.htm', '.js', '.css'
         ]))
+        # 线程内的本次下载尝试次数与最后一次错误，供 download_many 统计
+        self._local = threading.local()
+
+    def _attempt(self):
+        self._local.attempts = getattr(self._local, 'attempts', 0) + 1
 
     def _head(self, url):
         try:
@@ -99,35 +124,210 @@ class FileDownloader:
         return True, f"文件已存在且有效（{file_size}字节），跳过下载"
 
     @retry(max_retries=3, retry_delay=1)
-    def _stream_download(self, url, save_path):
+    def _stream_download(self, url, save_path, require_pdf=False):
+        """
+        先下载到 save_path.part，完成后再改名。出错时保留 .part 与记录 ETag/Last-Modified 的 .part.json，
+        重试（或下次运行）时用 Range + If-Range 从断点继续，文件在服务器上变化时自动从头下载。
+        require_pdf 时在下载流的第一个分块上校验 Content-Type/文件头，不是 PDF 立即中止，返回 (False, 原因)。
+        """
+        self._attempt()
+        part_path, meta_path = save_path + ".part", save_path + ".part.json"
+        try:
+            meta = self._load_part_meta(url, meta_path)
+            segmented = False
+            if self.segments > 1 and (meta is None or meta.get('segments')):
+                segmented = self._segmented_download(url, part_path, meta_path, meta)
+            if not segmented:
+                self._resume_download(url, part_path, meta_path, None if meta and meta.get('segments') else meta,
+                                      require_pdf)
+            if require_pdf and (segmented or self._local.saved_requests == 0):
+                # 分段或断点续传时没有从头读到文件头，落盘后补校验
+                with open(part_path, 'rb') as f:
+                    self._check_pdf(None, f.read(5))
+            size = os.path.getsize(part_path)
+            if size < self.min_valid_size:
+                self._remove_part(part_path, meta_path)
+                raise Exception(f"下载文件过小（{size}字节），判定为损坏")
+            os.replace(part_path, save_path)
+            self._remove_part(meta_path)
+            return True, f"下载成功（保存路径：{save_path}）"
+        except NotPdfError as e:
+            self._remove_part(part_path, meta_path)
+            return False, str(e)
+        except Exception as e:
+            self._local.error = str(e)
+            raise e
+
+    def _check_pdf(self, resp, head):
+        """
+        用真实下载流的响应头和第一个分块校验 PDF（与 is_valid_pdf 规则一致），
+        并记录相对 is_valid_pdf + 下载 省下的请求数（HEAD，及 HEAD 判断不出时的探测 GET）
+        """
+        ctype = (resp.headers.get('Content-Type') or '').lower() if resp is not None else ''
+        if 'application/pdf' not in ctype and not head.startswith(self.PDF_MAGIC_NUMBER):
+            # 旧流程 HEAD + 探测 GET 后放弃，现在只用了这一次 GET
+            self._local.saved_requests = 1
+            raise NotPdfError("非PDF文件或PDF校验不通过")
+        self._local.saved_requests = 1 if 'application/pdf' in ctype else 2
+
+    @staticmethod
+    def _remove_part(*paths):
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def _load_part_meta(url, meta_path):
         try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return meta if meta.get('url') == url else None
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_part_meta(meta_path, meta):
+        tmp = meta_path + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    @staticmethod
+    def _part_meta(url, resp):
+        """记录用于校验断点的 ETag/Last-Modified；压缩传输时长度与落盘字节数不同，不记录长度也不续传"""
+        encoded = bool(resp.headers.get('Content-Encoding'))
+        length = resp.headers.get('Content-Length')
+        return {
+            'url': url,
+            'etag': None if encoded else resp.headers.get('ETag'),
+            'last_modified': None if encoded else resp.headers.get('Last-Modified'),
+            'length': int(length) if length and not encoded else None,
+        }
+
+    def _resume_download(self, url, part_path, meta_path, meta, require_pdf=False):
+        headers = dict(self.headers)
+        offset = os.path.getsize(part_path) if meta and os.path.exists(part_path) else 0
+        validator = meta and (meta.get('etag') or meta.get('last_modified'))
+        if offset and validator and offset == meta.get('length'):
+            # 上次写完最后一块后、改名前中断，.part 已完整
+            logger.info(f"[{url}] .part 已完整（{offset}字节），直接完成")
+            return
+        if offset and validator:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+        with requests.get(
+            url,
+            headers=headers,
+            proxies=self.proxies,
+            verify=self.verify_ssl,
+            timeout=self.timeout,
+            stream=True
+        ) as resp:
+            if resp.status_code == 416 and 'Range' in headers:
+                # 断点已在文件末尾：Content-Range 为 "bytes */<总长>"，与本地大小一致即视为完成
+                total = resp.headers.get('Content-Range', '').rpartition('/')[2]
+                if not total.isdigit() or int(total) == offset:
+                    logger.info(f"[{url}] .part 已完整（{offset}字节），直接完成")
+                    return
+                self._remove_part(part_path, meta_path)
+                raise Exception(f"断点（{offset}字节）超出服务器文件长度（{total}字节），将重新下载")
+            resp.raise_for_status()
+            content_range = resp.headers.get('Content-Range', '')
+            if resp.status_code == 206 and content_range.startswith(f"bytes {offset}-"):
+                logger.info(f"[{url}] 从 {offset} 字节处断点续传")
+                mode = 'ab'
+            else:
+                # 首次下载，或服务器上的文件已变化（If-Range 不匹配时返回 200 全量）
+                meta = self._part_meta(url, resp)
+                mode = 'wb'
+            chunks = resp.iter_content(chunk_size=self.chunk_size)
+            first = next(chunks, b'')
+            if require_pdf and mode == 'wb':
+                self._check_pdf(resp, first)
+            if mode == 'wb':
+                self._save_part_meta(meta_path, meta)
+            with open(part_path, mode) as f:
+                f.write(first)
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+        size = os.path.getsize(part_path)
+        if meta.get('length') and size != meta['length']:
+            raise Exception(f"下载不完整（{size}/{meta['length']}字节），将断点续传")
+
+    def _segmented_download(self, url, part_path, meta_path, meta):
+        """
+        分段并发下载：预分配 .part 后各段按偏移写入，完成的段记录在 .part.json 中，重试时只补未完成的段。
+        服务器不支持 Range、文件较小或使用压缩传输时返回 False，退回单连接下载。
+        """
+        if meta is not None and (not os.path.exists(part_path) or os.path.getsize(part_path) != meta['length']):
+            meta = None
+        if meta is None:
+            head = self._head(url)
+            if head is None or (head.headers.get('Accept-Ranges') or '').lower() != 'bytes':
+                return False
+            meta = self._part_meta(url, head)
+            if not meta['length'] or meta['length'] < self.segment_min_size:
+                return False
+            meta.update(segments=self.segments, done=[])
+            with open(part_path, 'wb') as f:
+                if hasattr(os, 'posix_fallocate'):
+                    os.posix_fallocate(f.fileno(), 0, meta['length'])
+                else:
+                    f.truncate(meta['length'])
+            self._save_part_meta(meta_path, meta)
+        length = meta['length']
+        step = -(-length // meta['segments'])
+        validator = meta.get('etag') or meta.get('last_modified')
+        lock = threading.Lock()
+        changed = []
+
+        def fetch(index, start, end):
+            headers = dict(self.headers, Range=f"bytes={start}-{end}")
+            if validator:
+                headers['If-Range'] = validator
             with requests.get(
                 url,
-                headers=self.headers,
+                headers=headers,
                 proxies=self.proxies,
                 verify=self.verify_ssl,
                 timeout=self.timeout,
                 stream=True
             ) as resp:
                 resp.raise_for_status()
-                with open(save_path, 'wb') as f:
+                if resp.status_code != 206:
+                    changed.append(index)
+                    raise Exception("服务器未返回分段内容（文件可能已变化），将重新下载")
+                pos = start
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
                     for chunk in resp.iter_content(chunk_size=self.chunk_size):
                         if chunk:
                             f.write(chunk)
-            size = os.path.getsize(save_path)
-            if size < self.min_valid_size:
-                os.remove(save_path)
-                raise Exception(f"下载文件过小（{size}字节），判定为损坏")
-            return True, f"下载成功（保存路径：{save_path}）"
-        except Exception as e:
-            if os.path.exists(save_path):
-                os.remove(save_path)
-            raise e
+                            pos += len(chunk)
+            if pos != end + 1:
+                raise Exception(f"分段 {index} 不完整（{pos - start}/{end + 1 - start}字节）")
+            with lock:
+                meta['done'].append(index)
+                self._save_part_meta(meta_path, meta)
+
+        ranges = [(i, i * step, min(length, (i + 1) * step) - 1) for i in range(meta['segments']) if i * step < length]
+        try:
+            with ThreadPoolExecutor(max_workers=meta['segments']) as executor:
+                futures = [executor.submit(fetch, *r) for r in ranges if r[0] not in meta['done']]
+                for future in futures:
+                    future.result()
+        finally:
+            if changed:
+                self._remove_part(part_path, meta_path)
+        return True
 
     @retry(max_retries=2, retry_delay=1)
-    def _get_bytes(self, url):
-        with requests.get(
+    def _get_bytes(self, url, require_pdf=False):
+        self._attempt()
+        with cached_get(
             url,
+            cache=self.cache,
             headers=self.headers,
             proxies=self.proxies,
             verify=self.verify_ssl,
@@ -135,7 +335,18 @@ class FileDownloader:
             stream=True
         ) as resp:
             resp.raise_for_status()
-            content = resp.content
+            if require_pdf:
+                chunks = resp.iter_content(chunk_size=self.chunk_size)
+                first = next(chunks, b'')
+                try:
+                    self._check_pdf(resp, first)
+                except NotPdfError as e:
+                    # 返回 None 而不是抛异常，避免 retry 重复请求
+                    self._local.error = str(e)
+                    return None
+                content = first + b''.join(chunks)
+            else:
+                content = resp.content
             if len(content) < self.min_valid_size:
                 raise Exception(f"下载内容过小（{len(content)}字节）")
             return content
@@ -203,41 +414,103 @@ class FileDownloader:
         强制默认执行 URL 合法性校验（协议/片段/后缀/目录链接过滤）。
         - save_to_disk=True（默认）：保存到磁盘，未指定 save_dir 时保存到当前工作目录，返回 (ok, save_path)
         - save_to_disk=False：不落盘，直接返回字节内容，返回 (ok, bytes)
+        - require_pdf=True：在下载流本身上校验 PDF，不再额外发 HEAD/探测请求
         """
+        self._local.error = None
+        self._local.saved_requests = 0
         try:
             # URL 合法性强制校验
             if not self.is_downloadable_url(url):
                 raise Exception("不合法的下载链接或被过滤的后缀")
-            if require_pdf and not self.is_valid_pdf(url):
-                raise Exception("非PDF文件或PDF校验不通过")
             if not save_to_disk:
-                content = self._get_bytes(url)
+                content = self._get_bytes(url, require_pdf)
                 if not content:
-                    raise Exception("下载失败")
+                    raise Exception(self._local.error or "下载失败")
                 return True, content
 
             # 保存到磁盘：默认保存到当前工作目录
-            target_dir = save_dir or os.getcwd()
-            os.makedirs(target_dir, exist_ok=True)
-            name = file_name or self.infer_filename(url)
-            save_path = os.path.abspath(os.path.join(target_dir, clean_name(name)))
+            save_path = self.get_save_path(url, save_dir, file_name)
             skip, msg = self.check_file_exist(save_path)
             if skip:
+                if require_pdf:
+                    # 已存在的文件也要校验文件头，之前保存的错误页不能当作 PDF 返回
+                    with open(save_path, 'rb') as f:
+                        if not f.read(5).startswith(self.PDF_MAGIC_NUMBER):
+                            raise Exception("已存在的文件不是PDF，PDF校验不通过")
                 logger.info(f"[{url}] {msg}")
                 return True, save_path
-            success, msg = self._stream_download(url, save_path)
+            result = self._stream_download(url, save_path, require_pdf)
+            if not result:
+                raise Exception(self._local.error or "下载失败")
+            success, msg = result
             if success:
                 logger.success(f"[{url}] {msg}")
                 return True, save_path
-            return False, save_path
+            raise Exception(msg)
         except Exception as e:
             logger.error(f"[{url}] 下载处理异常：{str(e)}")
+            self._local.error = str(e)
             return False, None
 
+    def get_save_path(self, url, save_dir=None, file_name=None):
+        """download 落盘时使用的路径（不发起网络请求）"""
+        target_dir = save_dir or os.getcwd()
+        os.makedirs(target_dir, exist_ok=True)
+        name = file_name or self.infer_filename(url)
+        return os.path.abspath(os.path.join(target_dir, clean_name(name)))
+
     def download_bytes(self, url, require_pdf=False):
         """便捷方法：下载字节；同样强制执行 URL 合法性校验，可选 require_pdf"""
         return self.download(url, save_to_disk=False, require_pdf=require_pdf)
 
+    @retry(max_retries=2, retry_delay=1)
+    def _fetch_result(self, url, title, save_dir, sha256):
+        self._attempt()
+        with cached_get(
+            url,
+            cache=self.cache,
+            headers=self.headers,
+            proxies=self.proxies,
+            verify=self.verify_ssl,
+            timeout=self.timeout,
+            stream=True
+        ) as resp:
+            resp.raise_for_status()
+            result = stream_to_result(resp.iter_content(chunk_size=self.chunk_size), save_dir=save_dir,
+                                      sha256=sha256, file_url=url, file_name=title)
+        if result.size < self.min_valid_size:
+            if result.path:
+                os.remove(result.path)
+            raise Exception(f"下载内容过小（{result.size}字节）")
+        return result
+
+    def fetch_file(self, url, title=None, save_dir=None, sha256=False):
+        """
+        流式下载并在传输过程中计算 MD5（可选 SHA-256）、大小和类型，返回 DownloadResult。
+        指定 save_dir 时以 md5.ext 落盘，内存中只保留一个分块；否则内容保存在结果的内存缓冲中。
+        """
+        if not self.is_downloadable_url(url):
+            raise Exception("不合法的下载链接或被过滤的后缀")
+        result = self._fetch_result(url, title, save_dir, sha256)
+        if result is None:
+            raise Exception("下载失败")
+        return result
+
+    def download_many(self, urls, save_to_disk=True, save_dir=None, require_pdf=False,
+                      max_workers=8, per_host=4):
+        """
+        批量下载，返回按完成顺序产出结果的 DownloadBatch 迭代器，汇总统计见其 stats 属性。
+        urls 中的元素可以是 url，也可以是 (url, file_name)。
+        落盘模式下已存在且有效的文件直接跳过（check_file_exist），不占并发名额也不发请求。
+
+            batch = downloader.download_many(urls, save_dir="files", max_workers=16, per_host=4)
+            for result in batch:
+                print(result["url"], result["ok"], result["path"])
+            print(batch.stats)
+        """
+        return DownloadBatch(self, urls, save_to_disk=save_to_disk, save_dir=save_dir,
+                             require_pdf=require_pdf, max_workers=max_workers, per_host=per_host)
+
     # ================== 统一整合的下载相关高阶方法 ==================
 
     @retry(max_retries=3, retry_delay=1)
@@ -246,78 +519,173 @@ class FileDownloader:
         headers = {
             'User-Agent': self.headers.get('User-Agent', 'Mozilla/5.0')
         }
-        response = requests.get(url, headers=headers, timeout=min(self.timeout, 60), verify=self.verify_ssl)
+        response = cached_get(url, cache=self.cache, headers=headers, timeout=min(self.timeout, 60),
+                              verify=self.verify_ssl)
         response.raise_for_status()
         return response
 
-    def get_file_extension(self, url):
-        """根据文件内容的 MIME 推断扩展名"""
-        response = self.get_response(url)
-        file_content = response.content
-        MIME_TO_EXT = {
-            "application/pdf": "pdf",
-            "application/msword": "doc",
-            "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
-            "application/vnd.ms-excel": "xls",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
-            "application/vnd.ms-powerpoint": "ppt",
-            "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
-            "text/plain": "md",
-            "text/csv": "csv",
-            "text/markdown": "md",
-            "image/jpeg": "jpg",
-            "image/png": "png",
-            "image/gif": "gif",
-            "image/svg+xml": "svg",
-            "image/webp": "webp",
-            "application/zip": "zip",
-            "application/x-tar": "tar",
-            "application/gzip": "gz",
-            "application/x-bzip2": "bz2",
-            "application/x-7z-compressed": "7z",
-            "application/x-rar": "rar",
-            "application/json": "json",
-            "application/xml": "xml",
-            "text/html": "html",
-            "application/javascript": "js",
-            "text/css": "css",
-        }
-        try:
-            mime_type = magic.from_buffer(file_content, mime=True)
-            if mime_type in MIME_TO_EXT:
-                return MIME_TO_EXT[mime_type]
-        except Exception as e:
-            logger.error(f"错误: 判断文件类型失败 - {e}")
-        return ""
+    def get_file_extension(self, url, content=None):
+        """根据文件内容的 MIME 推断扩展名：只读取开头几 KB（或使用已下载的 content），结果按 url 记忆"""
+        return sniff_url_type(url, content, headers=self.headers, proxies=self.proxies,
+                              verify=self.verify_ssl, timeout=min(self.timeout, 60))
 
     def check_file(self, title, url=None, content=None):
         """下载/或接收内容 → 识别类型 → doc→docx → md5 命名，返回 (content, ext, name)"""
+        md5 = None
         if content is None:
-            ext = start_detect_file_type(url, title)
-            ok, content = self.download_bytes(url)
-            if not ok or not content:
-                raise Exception("下载失败")
+            # 下载过程中顺带算出 MD5 并识别类型，不再整份重算，也不再为识别类型重复下载
+            result = self.fetch_file(url, title)
+            content, ext, md5 = result.read(), result.ext, result.md5
+            del result
         else:
             ext = start_detect_file_type(file_url=None, file_name=title)
 
         if ext == "doc":
             content = convert_doc_to_docx_from_url(url or '', content)
             ext = "docx"
+            md5 = None
 
-        md5 = calculate_md5(content)
+        md5 = md5 or calculate_md5(content)
         name = md5 + "." + ext
         return content, ext, name
 
-    def get_file(self, url, title):
-        """根据 url 获取文件；若为压缩包则展开并逐个规范化"""
-        files = []
+    def get_file(self, url, title, **archive_options):
+        """根据 url 获取文件；若为压缩包则展开并并行规范化成员（archive_options 见 process_archive）"""
         content, ext, name = self.check_file(title=title, url=url)
-        if ext in ["zip", "rar", "tar", "gz", "bz2", "7z"]:
-            extracted_files = extract_archive(content, name, ext)
-            for content, new_name in extracted_files:
-                content, ext, name = self.check_file(title=new_name, content=content)
-                logger.info(f"已提取文件新名字：{name}")
-                files.append((content, name))
+        if ext in ARCHIVE_TYPES:
+            return process_archive(content, name, ext, **archive_options)
+        return [(content, name)]
+
+
+class DownloadBatch:
+    """
+    download_many 的结果迭代器：总并发 max_workers，单主机并发 per_host，
+    按主机轮转调度，某个主机排队很长时不会占满所有线程；结果按完成顺序产出。
+    """
+
+    def __init__(self, downloader, urls, save_to_disk=True, save_dir=None, require_pdf=False,
+                 max_workers=8, per_host=4):
+        self.downloader = downloader
+        self.jobs = [(url, None) if isinstance(url, str) else tuple(url) for url in urls]
+        self.save_to_disk = save_to_disk
+        self.save_dir = save_dir
+        self.require_pdf = require_pdf
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.stats = {
+            'total': len(self.jobs),
+            'succeeded': 0,
+            'failed': 0,
+            'skipped': 0,
+            'bytes': 0,
+            'retries': 0,
+            'saved_requests': 0,
+            'elapsed': 0.0,
+            'download_seconds': 0.0,
+            'max_seconds': 0.0,
+            'failures': [],
+        }
+
+    def _run(self, url, file_name):
+        local = self.downloader._local
+        local.attempts = 0
+        local.error = None
+        start = time.time()
+        if self.save_to_disk:
+            ok, data = self.downloader.download(url, save_dir=self.save_dir, file_name=file_name,
+                                                require_pdf=self.require_pdf)
         else:
-            files.append((content, name))
-        return files
+            ok, data = self.downloader.download_bytes(url, require_pdf=self.require_pdf)
+        return self._result(url, ok, data, start)
+
+    def _result(self, url, ok, data, start):
+        local = self.downloader._local
+        result = {
+            'url': url,
+            'ok': ok,
+            'skipped': False,
+            'seconds': round(time.time() - start, 3),
+            'retries': max(local.attempts - 1, 0),
+            'saved_requests': local.saved_requests,
+            'error': None if ok else (local.error or '下载失败'),
+        }
+        if self.save_to_disk:
+            result['path'] = data
+            result['bytes'] = os.path.getsize(data) if ok else 0
+        else:
+            result['content'] = data
+            result['bytes'] = len(data) if ok else 0
+        return result
+
+    def _skip(self, url, file_name):
+        """已存在的有效文件直接返回结果，不进入线程池"""
+        if not self.save_to_disk or not self.downloader.is_downloadable_url(url):
+            return None
+        save_path = self.downloader.get_save_path(url, self.save_dir, file_name)
+        exist, msg = self.downloader.check_file_exist(save_path)
+        if not exist:
+            return None
+        logger.info(f"[{url}] {msg}")
+        return {'url': url, 'ok': True, 'skipped': True, 'seconds': 0.0, 'retries': 0, 'saved_requests': 0, 'error': None,
+                'path': save_path, 'bytes': os.path.getsize(save_path)}
+
+    def _record(self, result):
+        stats = self.stats
+        if result['skipped']:
+            stats['skipped'] += 1
+        elif result['ok']:
+            stats['succeeded'] += 1
+        else:
+            stats['failed'] += 1
+            stats['failures'].append((result['url'], result['error']))
+        stats['bytes'] += result['bytes']
+        stats['retries'] += result['retries']
+        stats['saved_requests'] += result['saved_requests']
+        stats['download_seconds'] += result['seconds']
+        stats['max_seconds'] = max(stats['max_seconds'], result['seconds'])
+
+    def _plan(self):
+        """已存在的文件直接产出结果，其余按主机分组排队"""
+        skipped, hosts = [], OrderedDict()
+        for url, file_name in self.jobs:
+            result = self._skip(url, file_name)
+            if result is not None:
+                self._record(result)
+                skipped.append(result)
+                continue
+            hosts.setdefault(urllib.parse.urlparse(url).netloc, deque()).append((url, file_name))
+        return skipped, hosts
+
+    def _schedule(self, hosts, active, running, submit):
+        """按主机轮转补满空闲名额，running 记录 任务 → 主机"""
+        for host in list(hosts):
+            queue = hosts[host]
+            while queue and active[host] < self.per_host and len(running) < self.max_workers:
+                url, file_name = queue.popleft()
+                running[submit(url, file_name)] = host
+                active[host] += 1
+            if not queue:
+                del hosts[host]
+
+    def _finish(self, start):
+        self.stats['elapsed'] = round(time.time() - start, 3)
+        stats = self.stats
+        logger.info(f"批量下载完成：成功 {stats['succeeded']}，跳过 {stats['skipped']}，失败 {stats['failed']}，"
+                    f"{stats['bytes']} 字节，重试 {stats['retries']} 次，省去 {stats['saved_requests']} 次请求，耗时 {stats['elapsed']}s")
+
+    def __iter__(self):
+        start = time.time()
+        skipped, hosts = self._plan()
+        yield from skipped
+        active = {host: 0 for host in hosts}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while hosts or running:
+                self._schedule(hosts, active, running, lambda url, file_name: executor.submit(self._run, url, file_name))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    active[running.pop(future)] -= 1
+                    result = future.result()
+                    self._record(result)
+                    yield result
+        self._finish(start)
@@ -1,23 +1,31 @@
-import subprocess
 import time
 from urllib.parse import urlparse
 import html2text
 from curl_cffi import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 from urllib.parse import urlparse
 import zipfile
 import tarfile
 import rarfile
 import gzip
+import bz2
+import lzma
 import shutil
 import urllib
 import ftfy
 import re
 from spider_tools.utils import *
+from spider_tools.download_cache import cached_get, get_download_cache, cached_convert
+from spider_tools.office_converter import get_converter
 import os
 import tempfile
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Optional
 import requests
-from pathlib import Path
 import magic
 import os
 import pandas as pd
@@ -29,6 +37,14 @@ import io
 from pathvalidate import sanitize_filename
 from pathvalidate.handler import ReservedNameHandler
 
+# 尝试导入py7zr（7z 解压，可选依赖）
+try:
+    import py7zr
+
+    PY7ZR_AVAILABLE = True
+except ImportError:
+    PY7ZR_AVAILABLE = False
+
 def clean_name(filename):
     """基于pathvalidate的文件名清理函数，适配Windows系统"""
     # 1. 用pathvalidate清理非法字符（替换为下划线），处理保留名
@@ -81,7 +97,11 @@ def get_filename_from_response(response):
     # 使用 ftfy 修复文件名
     return ftfy.fix_text(filename) if filename else None
 
-def start_detect_file_type(file_url=None, file_name=None):
+def start_detect_file_type(file_url=None, file_name=None, content=None):
+    """
+    依次根据 url 路径后缀、文件内容、文件名后缀判断扩展名。
+    已有内容时传入 content 直接识别；否则只读取 url 开头几 KB 识别，结果按 url 记忆
+    """
     if isinstance(file_url, bytes):
         file_url = file_url.decode('utf-8', errors='replace')
 
@@ -91,170 +111,343 @@ def start_detect_file_type(file_url=None, file_name=None):
     if file_name is not None:
         sources.append(file_name)
 
+    sniffed = False
     for source in sources:
         # 使用正则表达式匹配文件后缀名
         match = re.search(r'\.([a-zA-Z]+)$', source)
         if match:
             return match.group(1).lower()
-        else:
-            ext = get_file_extension(file_url)
-            if ext:
-                supported_file_types = {
-                    'doc', 'docx', 'wps', 'pdf', 'txt', 'rtf',
-                    'xls', 'xlsx', 'et', 'csv',
-                    'ppt', 'pptx',
-                    'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff',
-                    'zip', 'rar', '7z', 'tar', 'gz', 'tgz', 'tar.gz', 'bz2',
-                }
-                if ext in supported_file_types:
-                    return ext.lower()
+        elif not sniffed and (file_url or content is not None):
+            # 内容识别只做一次
+            sniffed = True
+            ext = get_file_extension(file_url, content)
+            if ext in SUPPORTED_FILE_TYPES:
+                return ext.lower()
     logger.info(f"未识别文件类型, url地址为{file_url}, 名称为{file_name}")
     return ''
 
-def extract_archive(archive_content, archive_name, file_type):
-    # 设置UnRAR.exe路径
-    if not set_unrar_path():
-        logger.error("无法设置UnRAR.exe路径，RAR文件解压可能失败")
+class ArchiveLimitError(Exception):
+    """压缩包成员或解压总量超过 iter_archive 设置的大小限制"""
+
+
+class _LimitedReader:
+    """包装成员的文件对象，读取量超过 limit 时抛出 ArchiveLimitError（防止声明大小与实际不符的压缩炸弹）"""
+
+    def __init__(self, raw, limit, name):
+        self.raw = raw
+        self.limit = limit
+        self.name = name
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        if self.limit is None:
+            data = self.raw.read(size)
+            self.bytes_read += len(data)
+            return data
+        if size is not None and size >= 0:
+            return self._read_limited(size)
+        # 整体读取也分块进行，解压过程中就能发现超限，不会先把整个成员解压到内存
+        chunks = []
+        while True:
+            chunk = self._read_limited(1024 * 1024)
+            if not chunk:
+                return b"".join(chunks)
+            chunks.append(chunk)
+
+    def _read_limited(self, size):
+        # 底层每次最多多读 1 字节，刚好能判断是否超限
+        data = self.raw.read(min(size, self.limit - self.bytes_read + 1))
+        self.bytes_read += len(data)
+        if self.bytes_read > self.limit:
+            raise ArchiveLimitError(f"解压内容超过限制（{self.limit}字节）：{self.name}")
+        return data
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveMember:
+    """
+    iter_archive 产出的压缩包成员：name 为 "压缩包名/成员路径"，size 为声明的解压后大小（未知时为 None）。
+    内容需在迭代到下一个成员之前读取（open() 流式读取，read() 整体读取）
+    """
+
+    def __init__(self, name, size, opener, limit=None):
+        self.name = name
+        self.size = size
+        self.limit = limit
+        self._opener = opener
+        self._readers = []
 
-    temp_dir = tempfile.mkdtemp(prefix=f"extract_{archive_name}_")
+    def open(self):
+        reader = _LimitedReader(self._opener(), self.limit, self.name)
+        self._readers.append(reader)
+        return reader
+
+    def read(self):
+        with self.open() as f:
+            return f.read()
+
+    @property
+    def bytes_read(self):
+        return max((reader.bytes_read for reader in self._readers), default=0)
+
+
+def _decode_member_name(name):
     try:
-        archive_path = os.path.join(temp_dir, archive_name)
-        with open(archive_path, 'wb') as f:
-            f.write(archive_content)
-        archive_base_name = os.path.splitext(archive_name)[0]
-        results = []
-        if file_type == "zip":
-            with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                for info in zip_ref.infolist():
-                    if not info.is_dir():
-                        content = zip_ref.read(info.filename)
-                        try:
-                            filename = info.filename.encode('cp437').decode('gbk')
-                        except (UnicodeEncodeError, UnicodeDecodeError):
-                            filename = info.filename
-                        new_filename = f"{archive_base_name}/{filename}"
-                        results.append((content, new_filename))
-        elif file_type in ('tar', 'tar.gz', 'tgz', 'tar.bz2', 'tbz2'):
-            if file_type == '.tar':
-                mode = 'r'
-            elif file_type in ('tar.gz', 'tgz'):
-                mode = 'r:gz'
-            elif file_type in ('tar.bz2', 'tbz2'):
-                mode = 'r:bz2'
-            with tarfile.open(archive_path, mode) as tar_ref:
-                for member in tar_ref.getmembers():
-                    if member.isfile():
-                        content = tar_ref.extractfile(member).read()
-                        try:
-                            filename = member.name.encode('cp437').decode('gbk')
-                        except (UnicodeEncodeError, UnicodeDecodeError):
-                            filename = member.name
-                        new_filename = f"{archive_base_name}/{filename}"
-                        results.append((content, new_filename))
-        elif file_type == 'rar':
-            with rarfile.RarFile(archive_path, 'r') as rar_ref:
-                for file in rar_ref.infolist():
-                    if not file.isdir():
-                        content = rar_ref.read(file.filename)
-                        try:
-                            filename = file.filename.encode('cp437').decode('gbk')
-                        except (UnicodeEncodeError, UnicodeDecodeError):
-                            filename = file.filename
-                        new_filename = f"{archive_base_name}/{filename}"
-                        results.append((content, new_filename))
-        elif file_type == 'gz':
-            try:
-                with gzip.open(archive_path, 'rb') as f_in:
-                    content = f_in.read()
-                    out_file_name = os.path.splitext(archive_name)[0]
-                    try:
-                        filename = out_file_name.encode('cp437').decode('gbk')
-                    except (UnicodeEncodeError, UnicodeDecodeError):
-                        filename = out_file_name
-                    new_filename = f"{archive_base_name}/{filename}"
-                    results.append((content, new_filename))
-            except Exception as e:
-                logger.error(f"解压缩 GZ 文件 {archive_name} 时出错: {e}")
+        return name.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return name
+
+
+# 压缩包文件头（魔数）
+ARCHIVE_SIGNATURES = (
+    (b"PK\x03\x04", "zip"),
+    (b"PK\x05\x06", "zip"),
+    (b"PK\x07\x08", "zip"),
+    (b"Rar!\x1a\x07", "rar"),
+    (b"7z\xbc\xaf\x27\x1c", "7z"),
+    (b"\x1f\x8b", "gz"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+)
+
+# tar 及单文件压缩格式 -> 压缩方式（None 为未压缩的 tar）
+_TAR_COMPRESSION = {
+    'tar': None,
+    'gz': 'gz', 'tgz': 'gz', 'tar.gz': 'gz',
+    'bz2': 'bz2', 'tbz2': 'bz2', 'tar.bz2': 'bz2',
+    'xz': 'xz', 'txz': 'xz', 'tar.xz': 'xz',
+}
+
+_STREAM_OPENERS = {'gz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+def sniff_archive_type(head):
+    """根据文件开头的字节识别压缩格式（zip/rar/7z/gz/bz2/xz/tar），识别不了返回 None"""
+    for signature, archive_type in ARCHIVE_SIGNATURES:
+        if head.startswith(signature):
+            return archive_type
+    if head[257:262] == b"ustar":
+        return "tar"
+    return None
+
+
+def _read_archive_head(source, size=512):
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            return f.read(size)
+    position = source.tell()
+    head = source.read(size)
+    source.seek(position)
+    return head
+
+
+def _is_tar(source):
+    """是否为 tar（含 gz/bz2/xz 压缩的 tar）"""
+    position = None if isinstance(source, str) else source.tell()
+    try:
+        if position is None:
+            tar_ref = tarfile.open(source, 'r:*')
         else:
-            logger.error(f"不支持的压缩包类型: {archive_name}, {file_type}")
-        return results
+            tar_ref = tarfile.open(fileobj=source, mode='r:*')
+        with tar_ref:
+            return True
+    except (tarfile.TarError, EOFError, OSError, lzma.LZMAError):
+        return False
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def _archive_entries(source, archive_name, file_type, max_member_size=None, max_total_size=None, extensions=None):
+    """
+    按格式打开压缩包，逐个产出 (成员路径, 声明大小, 打开函数)，压缩包在迭代期间保持打开。
+    大小与后缀的过滤由 iter_archive 负责，这里只在需要先整体解压的 7z 上提前应用
+    """
+    if file_type == "zip":
+        with zipfile.ZipFile(source, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda info=info: zip_ref.open(info)
+    elif file_type in _TAR_COMPRESSION and _is_tar(source):
+        # r:* 自动识别是否压缩
+        if isinstance(source, str):
+            tar_ref = tarfile.open(source, 'r:*')
+        else:
+            tar_ref = tarfile.open(fileobj=source, mode='r:*')
+        with tar_ref:
+            for member in tar_ref:
+                if member.isfile():
+                    yield member.name, member.size, lambda member=member: tar_ref.extractfile(member)
+    elif _TAR_COMPRESSION.get(file_type):
+        # 单个文件的 gz/bz2/xz 压缩，成员名为去掉压缩后缀的文件名
+        compression = _TAR_COMPRESSION[file_type]
+        yield os.path.splitext(archive_name)[0], None, lambda: _STREAM_OPENERS[compression](source, 'rb')
+    elif file_type == 'rar':
+        # 设置UnRAR.exe路径
+        if not set_unrar_path():
+            logger.error("无法设置UnRAR.exe路径，RAR文件解压可能失败")
+        with rarfile.RarFile(source, 'r') as rar_ref:
+            for file in rar_ref.infolist():
+                if not file.isdir():
+                    yield file.filename, file.file_size, lambda file=file: rar_ref.open(file)
+    elif file_type == '7z':
+        if not PY7ZR_AVAILABLE:
+            # 抛出而不是返回空，调用方（如 process_archive）可以把压缩包当普通文件保留
+            raise RuntimeError(f"未安装 py7zr（pip install spider-tools-pro[archive]），无法解压 7z 文件: {archive_name}")
+        # 7z 多为固实压缩，逐个成员随机读取代价高：按块顺序解压到临时目录，再逐个从磁盘读取。
+        # 后缀与大小限制在解压前应用到 targets，不会把会被跳过的成员写到磁盘
+        with py7zr.SevenZipFile(source, 'r') as archive, \
+                tempfile.TemporaryDirectory(prefix="extract_7z_") as temp_dir:
+            infos = [info for info in archive.list() if not info.is_directory]
+            if extensions is not None:
+                infos = [info for info in infos
+                         if os.path.splitext(info.filename)[1].lower().lstrip('.') in extensions]
+            if max_member_size is not None:
+                infos = [info for info in infos if (info.uncompressed or 0) <= max_member_size]
+            if max_total_size is not None:
+                total, kept = 0, []
+                for info in infos:
+                    total += info.uncompressed or 0
+                    if total > max_total_size:
+                        break
+                    kept.append(info)
+                infos = kept
+            archive.extract(path=temp_dir, targets=[info.filename for info in infos])
+            for info in infos:
+                path = os.path.join(temp_dir, info.filename)
+                if os.path.isfile(path):
+                    yield info.filename, info.uncompressed, lambda path=path: open(path, 'rb')
+    else:
+        logger.error(f"不支持的压缩包类型: {archive_name}, {file_type}")
+
+
+def iter_archive(source, archive_name, file_type, max_member_size=None, max_total_size=None, extensions=None):
+    """
+    流式解压：逐个产出 ArchiveMember，不把所有成员同时读入内存，也不再复制一份临时压缩包。
+    - source: 压缩包路径、bytes，或 BytesIO 等可 seek 的文件对象
+    - max_member_size: 单个成员解压后的最大字节数，声明大小超限的成员跳过，实际读取超限时抛 ArchiveLimitError
+    - max_total_size: 所有成员解压后的总字节数上限，超过后停止迭代
+    - extensions: 只产出这些后缀的成员，如 {'pdf', 'docx'}
+    """
+    if isinstance(source, os.PathLike):
+        source = os.fspath(source)
+    elif isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    # 以文件头为准，扩展名与实际格式不符时按实际格式解压
+    detected = sniff_archive_type(_read_archive_head(source))
+    # 与识别结果比较的类型：tgz/tar.gz 等按压缩方式，未压缩的 tar 为 'tar'
+    expected = (_TAR_COMPRESSION[file_type] or 'tar') if file_type in _TAR_COMPRESSION else file_type
+    if detected and detected != expected:
+        logger.info(f"压缩包 {archive_name} 实际格式为 {detected}（按扩展名为 {file_type}）")
+        file_type = detected
+    if extensions is not None:
+        extensions = {ext.lower().lstrip('.') for ext in extensions}
+    archive_base_name = os.path.splitext(archive_name)[0]
+    total = 0
+    member = None
+    for filename, size, opener in _archive_entries(source, archive_name, file_type, max_member_size,
+                                                   max_total_size, extensions):
+        if member is not None:
+            total += member.bytes_read
+            member = None
+        filename = _decode_member_name(filename)
+        if extensions is not None and os.path.splitext(filename)[1].lower().lstrip('.') not in extensions:
+            continue
+        if max_member_size is not None and size is not None and size > max_member_size:
+            logger.warning(f"跳过过大的压缩包成员（{size}字节）：{archive_name}/{filename}")
+            continue
+        limit = max_member_size
+        if max_total_size is not None:
+            if total >= max_total_size or (size is not None and total + size > max_total_size):
+                logger.warning(f"压缩包 {archive_name} 解压总量超过限制（{max_total_size}字节），停止解压")
+                return
+            limit = max_total_size - total if limit is None else min(limit, max_total_size - total)
+        member = ArchiveMember(f"{archive_base_name}/{filename}", size, opener, limit)
+        yield member
+
+
+def extract_archive_to_dir(source, archive_name, file_type, save_dir, **kwargs):
+    """
+    流式解压到 save_dir（按成员路径建目录，内存中只保留一个读缓冲），返回 [(保存路径, 成员名)]。
+    kwargs 同 iter_archive（max_member_size/max_total_size/extensions）
+    """
+    results = []
+    root = os.path.abspath(save_dir)
+    for member in iter_archive(source, archive_name, file_type, **kwargs):
+        parts = [clean_name(part) for part in member.name.replace('\\', '/').split('/')
+                 if part not in ('', '.', '..')]
+        save_path = os.path.join(root, *parts)
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with member.open() as f_in, open(save_path, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        results.append((save_path, member.name))
+    return results
+
+
+def extract_archive(archive_content, archive_name, file_type):
+    """一次性解压，返回 [(content, name)]；大压缩包请用 iter_archive 逐个处理"""
+    try:
+        return [(member.read(), member.name) for member in iter_archive(archive_content, archive_name, file_type)]
     except Exception as e:
         logger.error(f"处理压缩包 {archive_name} 时出错: {e}")
         return []
-    finally:
-        shutil.rmtree(temp_dir)
 
 
 @retry(max_retries=2, retry_delay=1)
 def convert_doc_to_docx_from_url(url, content=None):
-    # 需要提前在win上安装
+    # 需要提前安装 LibreOffice（Linux 上可用包管理器安装，或设置环境变量 SOFFICE_PATH 指定 soffice 路径）
     # https://mirror-hk.koddos.net/tdf/libreoffice/stable/25.8.1/win/x86_64/LibreOffice_25.8.1_Win_x86-64.msi
     # 从URL下载doc文件并转换为docx格式，返回转换后的内容, 用来解决ragflow不能解析doc格式的问题
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_dir_path = Path(temp_dir)
-            temp_doc = temp_dir_path / "temp.doc"
-            temp_docx = temp_dir_path / "temp.docx"
-
-            # 1. 处理内容（下载/复用）
-            if not content:
-                response = requests.get(url, timeout=120, verify=False)
-                response.raise_for_status()
-                content = response.content
-
-            # 2. 新增：校验DOC文件头（判断是否为有效DOC文件）
-            doc_header = b"\xD0\xCF\x11\xE0"  # 所有正常DOC文件的开头标识
-            if not content.startswith(doc_header):
-                logger.error(f"不是有效DOC文件（文件头不匹配）：{url}")
-                return None
-            if len(content) < 1024:
-                logger.error(f"DOC文件过小（{len(content)}字节）：{url}")
-                return None
-
-            # 3. 写入临时文件
-            temp_doc.write_bytes(content)
-
-            # 4. 执行转换命令
-            soffice_path = r"D:\software\Libre\program\soffice.exe"
-            result = subprocess.run(
-                [soffice_path, "--headless", "--convert-to", "docx", "--outdir", str(temp_dir_path), str(temp_doc)],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", timeout=30
-            )
-
-            # 5. 打印soffice的详细日志（定位错误原因）
-            if result.returncode != 0:
-                logger.error(f"soffice stdout：{result.stdout}")  # 打印soffice的标准输出
-                logger.error(f"soffice stderr：{result.stderr}")  # 打印soffice的错误输出
-                raise Exception(f"转换失败（代码：{result.returncode}）")
-
-            # 6. 等待文件生成
-            for _ in range(10):
-                if temp_docx.exists():
-                    break
-                time.sleep(0.5)
-            else:
-                raise Exception("转换后文件未生成")
-            # 7. 读取返回
-            with open(temp_docx, "rb") as f:
-                logger.success(f"转换成功：{url}")
-                return f.read()
+        # 1. 处理内容（下载/复用）
+        if not content:
+            response = requests.get(url, timeout=120, verify=False)
+            response.raise_for_status()
+            content = response.content
+
+        # 2. 新增：校验DOC文件头（判断是否为有效DOC文件）
+        doc_header = b"\xD0\xCF\x11\xE0"  # 所有正常DOC文件的开头标识
+        if not content.startswith(doc_header):
+            logger.error(f"不是有效DOC文件（文件头不匹配）：{url}")
+            return None
+        if len(content) < 1024:
+            logger.error(f"DOC文件过小（{len(content)}字节）：{url}")
+            return None
+
+        # 3. 先查转换缓存，未命中再交给常驻的 LibreOffice 转换服务（排队、超时、崩溃重启见 office_converter）
+        docx = cached_convert(content, "docx:soffice",
+                              lambda: get_converter().convert(content, source_ext="doc", target="docx"))
+        logger.success(f"转换成功：{url}")
+        return docx
 
     except Exception as e:
         logger.error(f"转换失败（{url}）：{str(e)}")
         return None
 
-def extract_file_names(html_content, class_name=None, base_url=None):
-    """只用于解析文档中的文件url地址和获取文件名"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def collect_file_links(html_content, class_name=None, base_url=None):
+    """收集阶段：只解析文档（可传入 parse_html 的结果），按出现顺序返回候选附件 [(file_name, href)]，不发任何请求"""
+    soup = parse_html(html_content)
     target_tags = ['a', 'iframe', 'img']
     filtered_keywords = {'原文链接地址', '原文链接', '请到原网址下载附件', '详情请见原网站'}
-    files = []
+    links = []
     if class_name:
         target_elements = soup.find_all(class_=class_name)
         if not target_elements:
             return []
-        new_soup = BeautifulSoup(''.join(str(element) for element in target_elements), 'html.parser')
-        all_tags = new_soup.find_all(target_tags)
+        # 直接在匹配的元素内查找，不再序列化后重新解析
+        all_tags = []
+        for element in target_elements:
+            if element.name in target_tags:
+                all_tags.append(element)
+            all_tags.extend(element.find_all(target_tags))
     else:
         all_tags = soup.find_all(target_tags)
 
@@ -301,30 +494,105 @@ def extract_file_names(html_content, class_name=None, base_url=None):
 
         file_name = file_name.strip()
         if file_name and file_name not in filtered_keywords:
-            file_name = clean_name(file_name)
-            ext = start_detect_file_type(href, file_name)
-            if ext:
-                files.append({'file_name': file_name,'href': href})
-            else:
-                try:
-                    headers = {
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-                    response = requests.head(href, timeout=30, headers=headers)
-                    response.raise_for_status()
-                    content_type = response.headers.get('Content-Type', '')
-                    if content_type:
-                        if isinstance(content_type, bytes):
-                            content_type = content_type.decode('utf-8')
-                        mime_type = content_type.split(';')[0].strip().lower()
-                        if 'text/html' not in mime_type:
-                            files.append({
-                                'file_name': file_name,
-                                'href': href,
-                            })
-                except Exception as e:
-                    logger.info(f"请求失败: {href}, 错误: {str(e)}")
-                    continue
-    return files
+            links.append((clean_name(file_name), href))
+    return links
+
+
+# probe_file_link 的结果：href -> 是否为附件（多个页面共用，按最近使用淘汰）
+_PROBE_CACHE = OrderedDict()
+_PROBE_CACHE_SIZE = 4096
+_probe_lock = threading.Lock()
+
+
+def probe_file_link(href, file_name, timeout=30):
+    """
+    探测阶段：判断链接是否为附件（先按文件头识别类型，识别不了再看 HEAD 的 Content-Type 是否为 text/html），
+    结果按 href 记忆；请求失败返回 False 且不记忆
+    """
+    with _probe_lock:
+        if href in _PROBE_CACHE:
+            _PROBE_CACHE.move_to_end(href)
+            return _PROBE_CACHE[href]
+    is_file = False
+    if start_detect_file_type(href, file_name):
+        is_file = True
+    else:
+        try:
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+            response = requests.head(href, timeout=timeout, headers=headers)
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if content_type:
+                if isinstance(content_type, bytes):
+                    content_type = content_type.decode('utf-8')
+                mime_type = content_type.split(';')[0].strip().lower()
+                is_file = 'text/html' not in mime_type
+        except Exception as e:
+            logger.info(f"请求失败: {href}, 错误: {str(e)}")
+            return False
+    with _probe_lock:
+        _PROBE_CACHE[href] = is_file
+        if len(_PROBE_CACHE) > _PROBE_CACHE_SIZE:
+            _PROBE_CACHE.popitem(last=False)
+    return is_file
+
+
+def extract_file_names(html_content, class_name=None, base_url=None, max_workers=8, per_host=4, deadline=60):
+    """
+    只用于解析文档中的文件url地址和获取文件名。
+    先收集候选链接；url 路径或文件名带后缀的直接保留，其余链接并发探测
+    （max_workers 个线程，按主机轮转提交、同一主机最多 per_host 个并发，整页最多等待 deadline 秒，超时未完成的链接丢弃），
+    结果保持链接在文档中的顺序
+    """
+    links = collect_file_links(html_content, class_name, base_url)
+    keep = [None] * len(links)
+    pending = []
+    for index, (file_name, href) in enumerate(links):
+        if re.search(r'\.([a-zA-Z]+)$', urlparse(href).path) or re.search(r'\.([a-zA-Z]+)$', file_name):
+            keep[index] = True
+        else:
+            pending.append(index)
+
+    if pending:
+        # 按主机排队，提交前就占用主机名额：线程池里只有可以立即开始的探测，慢主机不会占满线程
+        hosts = OrderedDict()
+        for index in pending:
+            hosts.setdefault(urlparse(links[index][1]).netloc, deque()).append(index)
+        active = {host: 0 for host in hosts}
+        running = {}
+        end_time = time.monotonic() + deadline
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(pending)))
+        try:
+            while hosts or running:
+                for host in list(hosts):
+                    queue = hosts[host]
+                    while queue and active[host] < per_host and len(running) < max_workers:
+                        index = queue.popleft()
+                        file_name, href = links[index]
+                        future = executor.submit(probe_file_link, href, file_name, timeout=min(30, deadline))
+                        running[future] = (host, index)
+                        active[host] += 1
+                    if not queue:
+                        del hosts[host]
+                remaining = end_time - time.monotonic()
+                done = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)[0] if remaining > 0 else None
+                if not done:
+                    break
+                for future in done:
+                    host, index = running.pop(future)
+                    active[host] -= 1
+                    keep[index] = future.result()
+        finally:
+            # 不等待超时的探测线程，它们完成后结果仍会写入探测缓存
+            executor.shutdown(wait=False, cancel_futures=True)
+        for _, index in running.values():
+            logger.info(f"探测超时，跳过: {links[index][1]}")
+        for queue in hosts.values():
+            for index in queue:
+                logger.info(f"探测超时，跳过: {links[index][1]}")
+
+    return [{'file_name': file_name, 'href': href} for (file_name, href), ok in zip(links, keep) if ok]
 
 
 def set_unrar_path():
@@ -339,10 +607,20 @@ def set_unrar_path():
         logger.error(f"未找到UnRAR.exe，请确保文件位于: {unrar_path}")
         return False
 
+def parse_html(html):
+    """
+    用 html.parser 解析为 BeautifulSoup 树；传入的已经是解析好的树时原样返回，
+    调用方需要多个提取结果时可以解析一次后传给各函数共用
+    """
+    if isinstance(html, Tag):
+        return html
+    return BeautifulSoup(html, "html.parser")
+
+
 def get_html(html, class_name=None, id=None):
     if class_name is None:
         return html
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = parse_html(html)
     detail_elements = soup.find_all(class_=class_name, id=id)
     # 修正：如果列表不为空，将列表元素的文本内容拼接成字符串
     if detail_elements:
@@ -352,7 +630,7 @@ def get_html(html, class_name=None, id=None):
 
 
 def extract_item_content(html):
-    soup = BeautifulSoup(html, 'html.parser')
+    soup = parse_html(html)
     item_content = soup.get_text().replace("\xa0", '').replace("\n", '').replace("\r", '').replace("\t", '').replace(
         "\u3000", '')
     item_content = item_content.strip('[]')
@@ -771,62 +1049,265 @@ def get_markdown(item_name, html):
     return markdown, new_name
 
 
-def get_file_extension(url):
-    response = requests.get(
-        url,
-        timeout=60)
-    file_content = response.content
-    # MIME 类型到后缀名的映射表（常见类型）
-    MIME_TO_EXT = {
-        # 文档类
-        "application/pdf": "pdf",
-        "application/msword": "doc",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
-        "application/vnd.ms-excel": "xls",
-        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
-        "application/vnd.ms-powerpoint": "ppt",
-        "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
-        "text/plain": "md",
-        "text/csv": "csv",
-        "text/markdown": "md",
-
-        # 图片类
-        "image/jpeg": "jpg",
-        "image/png": "png",
-        "image/gif": "gif",
-        "image/svg+xml": "svg",
-        "image/webp": "webp",
-
-        # 压缩类
-        "application/zip": "zip",
-        "application/x-tar": "tar",
-        "application/gzip": "gz",
-        "application/x-bzip2": "bz2",
-        "application/x-7z-compressed": "7z",
-        "application/x-rar": "rar",
-
-        "application/json": "json",
-        "application/xml": "xml",
-        "text/html": "html",
-        "application/javascript": "js",
-        "text/css": "css",
-    }
-    """根据文件内容获取真实后缀名"""
+# MIME 类型到后缀名的映射表（常见类型）
+MIME_TO_EXT = {
+    # 文档类
+    "application/pdf": "pdf",
+    "application/msword": "doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.ms-excel": "xls",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": "xlsx",
+    "application/vnd.ms-powerpoint": "ppt",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+    "text/plain": "md",
+    "text/csv": "csv",
+    "text/markdown": "md",
+
+    # 图片类
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/svg+xml": "svg",
+    "image/webp": "webp",
+
+    # 压缩类
+    "application/zip": "zip",
+    "application/x-tar": "tar",
+    "application/gzip": "gz",
+    "application/x-bzip2": "bz2",
+    "application/x-xz": "xz",
+    "application/x-7z-compressed": "7z",
+    "application/x-rar": "rar",
+
+    "application/json": "json",
+    "application/xml": "xml",
+    "text/html": "html",
+    "application/javascript": "js",
+    "text/css": "css",
+}
+
+
+# 可识别的文件类型（与 start_detect_file_type 一致）
+SUPPORTED_FILE_TYPES = {
+    'doc', 'docx', 'wps', 'pdf', 'txt', 'rtf',
+    'xls', 'xlsx', 'et', 'csv',
+    'ppt', 'pptx',
+    'jpg', 'jpeg', 'png', 'gif', 'bmp', 'tiff',
+    'zip', 'rar', '7z', 'tar', 'gz', 'tgz', 'tar.gz', 'bz2', 'xz',
+}
+
+
+class StreamDigest:
+    """边接收分块边计算 MD5（可选 SHA-256）与大小，并保留开头 head_size 字节用于类型识别"""
+
+    def __init__(self, sha256=False, head_size=8192):
+        self.md5_hash = hashlib.md5()
+        self.sha256_hash = hashlib.sha256() if sha256 else None
+        self.head_size = head_size
+        self.head = b""
+        self.size = 0
+
+    def update(self, chunk):
+        self.md5_hash.update(chunk)
+        if self.sha256_hash is not None:
+            self.sha256_hash.update(chunk)
+        if len(self.head) < self.head_size:
+            self.head += chunk[:self.head_size - len(self.head)]
+        self.size += len(chunk)
+
+    @property
+    def md5(self):
+        return self.md5_hash.hexdigest()
+
+    @property
+    def sha256(self):
+        return self.sha256_hash.hexdigest() if self.sha256_hash is not None else None
+
+
+@dataclass
+class DownloadResult:
+    """流式下载结果：哈希、大小、识别出的类型，以及落盘路径或内存缓冲（二者其一）"""
+    md5: str
+    size: int
+    ext: str = ""
+    sha256: Optional[str] = None
+    path: Optional[str] = None
+    buffer: Optional[io.BytesIO] = None
+
+    @property
+    def name(self):
+        """与 check_file 一致的 md5 命名"""
+        return f"{self.md5}.{self.ext}"
+
+    def read(self):
+        if self.buffer is not None:
+            return self.buffer.getvalue()
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def open(self):
+        """以文件对象读取内容，落盘时不整体载入内存"""
+        if self.buffer is not None:
+            return io.BytesIO(self.buffer.getbuffer())
+        return open(self.path, 'rb')
+
+
+def sniff_file_type(head):
+    """根据文件开头的字节识别扩展名（libmagic），识别不了返回空串"""
     try:
-        mime_type = magic.from_buffer(file_content, mime=True)
-        if mime_type in MIME_TO_EXT:
-            return MIME_TO_EXT[mime_type]
+        return MIME_TO_EXT.get(magic.from_buffer(head, mime=True), "")
     except Exception as e:
         logger.error(f"错误: 判断文件类型失败 - {e}")
         return ""
 
 
+def detect_file_type(head, file_url=None, file_name=None):
+    """
+    与 start_detect_file_type 相同的判定顺序：url 路径后缀、文件内容、文件名后缀，
+    内容识别用已下载的开头字节，不再为识别类型重新下载整个文件
+    """
+    if isinstance(file_url, bytes):
+        file_url = file_url.decode('utf-8', errors='replace')
+    sources = [urlparse(file_url).path] if file_url else []
+    if file_name is not None:
+        sources.append(file_name)
+    sniffed = False
+    for source in sources:
+        match = re.search(r'\.([a-zA-Z]+)$', source)
+        if match:
+            return match.group(1).lower()
+        elif not sniffed and head:
+            sniffed = True
+            ext = sniff_file_type(head)
+            if ext in SUPPORTED_FILE_TYPES:
+                return ext
+    logger.info(f"未识别文件类型, url地址为{file_url}, 名称为{file_name}")
+    return ''
+
+
+def stream_to_result(chunks, save_dir=None, sha256=False, file_url=None, file_name=None):
+    """
+    消费分块迭代器，同时计算哈希/大小并写入 save_dir（以 md5.ext 命名）或内存缓冲，
+    内存峰值约为一个分块（落盘时）或文件大小本身（内存缓冲时），不再额外复制整份内容
+    """
+    digest = StreamDigest(sha256=sha256)
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".download_", dir=save_dir)
+        out = os.fdopen(fd, 'wb')
+    else:
+        out = io.BytesIO()
+    try:
+        for chunk in chunks:
+            if chunk:
+                digest.update(chunk)
+                out.write(chunk)
+    except Exception:
+        if save_dir:
+            out.close()
+            os.remove(tmp_path)
+        raise
+    result = DownloadResult(
+        md5=digest.md5,
+        size=digest.size,
+        ext=detect_file_type(digest.head, file_url, file_name),
+        sha256=digest.sha256,
+    )
+    if save_dir:
+        out.close()
+        result.path = os.path.join(save_dir, result.name)
+        os.replace(tmp_path, result.path)
+    else:
+        result.buffer = out
+    return result
+
+
+@retry(max_retries=2, retry_delay=1)
+def fetch_file(url, title=None, save_dir=None, sha256=False):
+    """流式下载 url，返回 DownloadResult（save_dir 为空时内容留在内存缓冲中）"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+    with cached_get(url, headers=headers, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        return stream_to_result(response.iter_content(chunk_size=1024 * 1024), save_dir=save_dir, sha256=sha256,
+                                file_url=url, file_name=title)
+
+
+# sniff_url_type 的结果：url -> 扩展名（按最近使用淘汰）
+_SNIFF_CACHE = OrderedDict()
+_SNIFF_CACHE_SIZE = 4096
+_sniff_lock = threading.Lock()
+
+
+def read_head(url, head_size=8192, **kwargs):
+    """
+    只读取 url 开头 head_size 字节：带 Range 请求，服务器忽略 Range 返回全量时读够即关闭连接；
+    下载缓存中已有该 url 时直接读本地内容。kwargs 透传给 requests.get（headers/proxies/verify/timeout）
+    """
+    cache = get_download_cache()
+    if cache is not None:
+        entry, _ = cache.lookup(url)
+        if entry is not None:
+            with open(cache.blob_path(entry['md5']), 'rb') as f:
+                return f.read(head_size)
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['Range'] = f"bytes=0-{head_size - 1}"
+    kwargs.setdefault('timeout', 30)
+    with requests.get(url, headers=headers, stream=True, **kwargs) as response:
+        if response.status_code == 416:
+            # 空文件
+            return b""
+        response.raise_for_status()
+        head = b""
+        for chunk in response.iter_content(chunk_size=head_size):
+            head += chunk
+            if len(head) >= head_size:
+                break
+    return head[:head_size]
+
+
+def sniff_url_type(url, content=None, head_size=8192, **kwargs):
+    """
+    按内容识别 url 的扩展名：有 content 时直接用其开头，否则用 read_head 只取开头几 KB；
+    识别结果按 url 记忆，同一链接不重复请求。识别不了返回空串
+    """
+    if url:
+        with _sniff_lock:
+            if url in _SNIFF_CACHE:
+                _SNIFF_CACHE.move_to_end(url)
+                return _SNIFF_CACHE[url]
+    if content is not None:
+        head = content[:head_size]
+    else:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+        kwargs.setdefault('headers', headers)
+        try:
+            head = read_head(url, head_size, **kwargs)
+        except Exception as e:
+            # 请求失败不记忆，下次重试
+            logger.info(f"读取文件头失败: {url}, 错误: {e}")
+            return ""
+    ext = sniff_file_type(head)
+    if url:
+        with _sniff_lock:
+            _SNIFF_CACHE[url] = ext
+            if len(_SNIFF_CACHE) > _SNIFF_CACHE_SIZE:
+                _SNIFF_CACHE.popitem(last=False)
+    return ext
+
+
+def get_file_extension(url, content=None):
+    """根据文件内容获取真实后缀名（只读取开头几 KB，或直接使用已下载的 content）"""
+    return sniff_url_type(url, content)
+
+
 @retry(max_retries=2, retry_delay=1)
 def get_response(url):
     """获取响应"""
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-    response = requests.get(url, headers=headers, timeout=30)
+    response = cached_get(url, headers=headers, timeout=30)
     response.raise_for_status()
     return response
 
@@ -839,10 +1320,14 @@ def check_file(title, url=None, content=None):
     返回 (content_bytes, ext, normalized_name_by_md5)
     """
     # 1、确定内容与扩展名
+    md5 = None
     if content is None:
-        # 从 URL 获取内容
-        ext = start_detect_file_type(url, title)
-        content = get_response(url).content
+        # 从 URL 流式获取内容，下载过程中顺带算出 MD5 并识别类型
+        result = fetch_file(url, title)
+        if result is None:
+            raise Exception("下载失败")
+        content, ext, md5 = result.read(), result.ext, result.md5
+        del result
     else:
         # 已有内容，基于标题推断扩展名
         ext = start_detect_file_type(file_url=None, file_name=title)
@@ -851,26 +1336,124 @@ def check_file(title, url=None, content=None):
     if ext == "doc":
         content = convert_doc_to_docx_from_url(url or '', content)
         ext = "docx"
+        md5 = None
 
     # 3、统一使用 MD5 作为文件名
-    md5 = calculate_md5(content)
+    md5 = md5 or calculate_md5(content)
     name = md5 + "." + ext
     return content, ext, name
 
 
-def get_file(url, title):
-    """根据url获取文件名"""
-    files = []
+# get_file 会展开的压缩包类型
+ARCHIVE_TYPES = ("zip", "rar", "tar", "gz", "bz2", "xz", "7z", "tgz")
+
+
+def _normalize_member(content, ext):
+    """成员按 md5 命名（与 check_file 一致），返回 (content, name)"""
+    return content, calculate_md5(content) + "." + ext
+
+
+def _convert_member(content, name):
+    """doc→docx，转换失败时保留原 doc"""
+    converted = convert_doc_to_docx_from_url('', content)
+    if converted is None:
+        logger.warning(f"doc 转换失败，保留原文件：{name}")
+        return content, "doc"
+    return converted, "docx"
+
+
+def process_archive(content, name, ext, max_workers=4, convert_workers=2, max_depth=3,
+                    max_total_size=2 * 1024 ** 3):
+    """
+    展开压缩包并规范化每个成员（按文件名识别类型 → doc→docx → md5 命名），返回 [(content, name)]，
+    顺序与逐个串行处理一致：
+    - md5 计算在 max_workers 个线程中并行（hashlib 处理大块数据时释放 GIL）
+    - doc→docx 是 LibreOffice 子进程调用，单独放在 convert_workers 个线程中，转换完成后再交给哈希线程
+    - 成员本身是压缩包时递归展开，最多 max_depth 层（超过的按普通文件返回），所有层合计解压总量不超过 max_total_size
+    """
+    hash_pool = ThreadPoolExecutor(max_workers=max_workers)
+    convert_pool = ThreadPoolExecutor(max_workers=convert_workers)
+    budget = [max_total_size]
+    futures = []
+
+    def convert_member(data, member_name, out):
+        # out 已取消（所在的嵌套压缩包展开失败）时不再转换
+        if not out.set_running_or_notify_cancel():
+            return
+        try:
+            converted, new_ext = _convert_member(data, member_name)
+            hashed = hash_pool.submit(_normalize_member, converted, new_ext)
+        except Exception as e:
+            out.set_exception(e)
+            return
+        hashed.add_done_callback(
+            lambda f: out.set_exception(f.exception()) if f.exception() else out.set_result(f.result()))
+
+    def exhausted():
+        logger.warning(f"压缩包 {name} 解压总量超过限制（{max_total_size}字节），停止解压")
+        budget[0] = 0
+
+    def discard(pending):
+        # 丢弃展开失败的压缩包已提交的成员：未开始的取消，已在处理的结果不再使用
+        for future in pending:
+            future.cancel()
+
+    def expand(archive_content, archive_name, archive_ext, depth, out):
+        # 各层共用 budget：每个成员读取前按剩余额度设置上限，读完扣减，额度用完后所有层都停止
+        for member in iter_archive(archive_content, archive_name, archive_ext, max_total_size=budget[0]):
+            if budget[0] <= 0 or (member.size is not None and member.size > budget[0]):
+                return exhausted()
+            member.limit = budget[0] if member.limit is None else min(member.limit, budget[0])
+            try:
+                data = member.read()
+            except ArchiveLimitError:
+                return exhausted()
+            budget[0] -= len(data)
+            member_ext = start_detect_file_type(file_url=None, file_name=member.name)
+            if member_ext in ARCHIVE_TYPES and depth < max_depth:
+                # 嵌套压缩包的成员先收集在 nested 中，整个展开成功后才并入结果
+                nested, remaining = [], budget[0]
+                try:
+                    expand(data, member.name, member_ext, depth + 1, nested)
+                    out.extend(nested)
+                    continue
+                except Exception as e:
+                    # 嵌套压缩包解不开时丢弃已展开的部分并退回其占用的额度，整个按普通文件返回
+                    logger.error(f"处理嵌套压缩包 {member.name} 时出错，按普通文件返回: {e}")
+                    discard(nested)
+                    budget[0] = remaining
+            if member_ext == "doc":
+                converted = Future()
+                convert_pool.submit(convert_member, data, member.name, converted)
+                out.append(converted)
+            else:
+                out.append(hash_pool.submit(_normalize_member, data, member_ext))
+
+    try:
+        try:
+            expand(content, name, ext, 1, futures)
+        except Exception as e:
+            # 解不开（如缺少 py7zr/unrar、文件损坏）时按普通文件返回，不丢弃附件
+            logger.error(f"处理压缩包 {name} 时出错，按普通文件返回: {e}")
+            discard(futures)
+            return [(content, name)]
+        files = []
+        for future in futures:
+            content, new_name = future.result()
+            logger.info(f"已提取文件新名字：{new_name}")
+            files.append((content, new_name))
+        return files
+    finally:
+        convert_pool.shutdown()
+        hash_pool.shutdown()
+
+
+def get_file(url, title, **archive_options):
+    """根据url获取文件名；压缩包展开后并行规范化成员，archive_options 见 process_archive"""
     content, ext, name = check_file(title=title, url=url)
-    if ext in ["zip", "rar", "tar", "gz", "bz2", "7z"]:
-        extracted_files = extract_archive(content, name, ext)
-        for content, new_name in extracted_files:
-            content, ext, name = check_file(title=new_name, content=content)
-            logger.info(f"已提取文件新名字：{name}")
-            files.append((content, name))
-    else:
-        files.append((content, name))
-    return files
+    if ext in ARCHIVE_TYPES:
+        return process_archive(content, name, ext, **archive_options)
+    return [(content, name)]
 
 
 def get_detail_data(item_data, html):
@@ -19,12 +19,17 @@ import os
 import requests
 import zipfile
 from retrying import retry
+from requests.adapters import HTTPAdapter
 from pathlib import Path
 import shutil
 import os
 import json
 import subprocess
 import base64
+import contextlib
+import queue
+import tempfile
+import threading
 from loguru import logger
 
 key1 = "PJLKMNOI3xyz021wvrpqstouHCFBDEGAnhikjlmgfZbacedYRXTSUVQW!56789+4"
@@ -63,6 +68,19 @@ class Config:
             "path_replace": True,
             "download_workers": 10,
             "convert_workers": 5,
+            "convert_mode": "pool",  # page: 逐页启动 ffdec; pool: 常驻工作池批量转换; batch: 整个 swf 目录一次转换
+            "ffdec_batch_size": 20,  # pool 模式下单次 ffdec 调用最多转换的页数
+            "ffdec_batch_linger": 0.5,  # pool 模式下凑批的最短等待（秒），之后工作线程都忙时继续凑批
+            "merge_chunk_pages": 100,  # 合并 PDF 时每 N 页写出一个分块，0 表示整本在内存中合并；拼接分块需 qpdf 才能保持内存有界
+            "pipeline": True,  # 下载、解压、转换、合并按页流水线执行
+            "in_memory": True,  # 流水线中 PH/PK 数据保存在内存，SWF 写到 tmpfs，不再反复读写磁盘
+            "tmpfs_path": "/dev/shm/",  # in_memory 模式存放 SWF 的内存文件系统，不存在时使用文档目录
+            "resume": True,  # in_memory 模式下仍把 PK 原始数据落盘，用于断点续传
+            "http2": False,  # 安装了 httpx[http2] 时，PH/PK 下载改走 HTTP/2 多路复用
+            "http_timeout": 30,  # 单次请求超时（秒）
+            "batch_docs": 3,  # 批量模式下同时处理的文档数
+            "batch_download_workers": 0,  # 批量模式下所有文档共享的下载并发上限，0 表示取 download_workers
+            "batch_convert_workers": 0,  # 批量模式下所有文档共享的 ffdec 并发上限，0 表示取 convert_workers
             "auto_mode": True  # 默认启用自动模式
         }
         self.config_path = config_path
@@ -107,6 +125,19 @@ class Config:
         self.path_replace = config_data["path_replace"]
         self.download_workers = config_data["download_workers"]
         self.convert_workers = config_data["convert_workers"]
+        self.convert_mode = config_data["convert_mode"]
+        self.ffdec_batch_size = config_data["ffdec_batch_size"]
+        self.ffdec_batch_linger = config_data["ffdec_batch_linger"]
+        self.merge_chunk_pages = config_data["merge_chunk_pages"]
+        self.pipeline = config_data["pipeline"]
+        self.in_memory = config_data["in_memory"]
+        self.tmpfs_path = config_data["tmpfs_path"]
+        self.resume = config_data["resume"]
+        self.http2 = config_data["http2"]
+        self.http_timeout = config_data["http_timeout"]
+        self.batch_docs = config_data["batch_docs"]
+        self.batch_download_workers = config_data["batch_download_workers"]
+        self.batch_convert_workers = config_data["batch_convert_workers"]
         self.auto_mode = config_data["auto_mode"]
 
     def reload(self):
@@ -130,6 +161,19 @@ class Config:
             "path_replace": self.path_replace,
             "download_workers": self.download_workers,
             "convert_workers": self.convert_workers,
+            "convert_mode": self.convert_mode,
+            "ffdec_batch_size": self.ffdec_batch_size,
+            "ffdec_batch_linger": self.ffdec_batch_linger,
+            "merge_chunk_pages": self.merge_chunk_pages,
+            "pipeline": self.pipeline,
+            "in_memory": self.in_memory,
+            "tmpfs_path": self.tmpfs_path,
+            "resume": self.resume,
+            "http2": self.http2,
+            "http_timeout": self.http_timeout,
+            "batch_docs": self.batch_docs,
+            "batch_download_workers": self.batch_download_workers,
+            "batch_convert_workers": self.batch_convert_workers,
             "auto_mode": self.auto_mode
         }
         try:
@@ -158,6 +202,11 @@ class gen_cfg:
         self.pageids = decode(self.pageInfo).split(",")
         self.p_count = len(self.pageids)
         self.headnums = self.headerInfo.replace('"', "").split(',')
+        # 每个文档自带路径，批量模式下多个文档并行时互不干扰
+        self.dir_path = cfg2.o_dir_path + self.p_code + "/"
+        self.swf_path = self.dir_path + cfg2.o_swf_path
+        self.svg_path = self.dir_path + cfg2.o_svg_path
+        self.pdf_path = self.dir_path + cfg2.o_pdf_path
 
     def ph_nums(self) -> int:
         return len(self.headnums)
@@ -414,13 +463,79 @@ def r(str):
     return '"' + str + '"'
 
 
+class http_pool:
+    """
+    提取器共享的 HTTP 连接池：同一主机的连接保持 keep-alive 复用，
+    每个主机的连接数与 download_workers 对齐。连接池本身不重试：download/fetch 对连接错误、超时与 429/5xx
+    按指数退避重试（每页最多 4 次，间隔 0.5s 起、上限 8s），404 等其他错误直接失败。
+    开启 http2 且安装了 httpx[http2] 时，PH/PK 下载走 HTTP/2 单连接多路复用。
+    """
+    session = None
+    client = None
+    lock = threading.Lock()
+
+    @classmethod
+    def size(cls) -> int:
+        return max(cfg2.download_workers, cfg2.batch_download_workers, 1)
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        with cls.lock:
+            if cls.session is None:
+                # 不在连接池层重试：download/fetch 的 @retry 已覆盖 HTTP/1.1 与 HTTP/2 两条路径，两层叠加会变成 4×4 次请求
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=cls.size())
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                cls.session = session
+            return cls.session
+
+    @classmethod
+    def get_client(cls):
+        """HTTP/2 客户端，未开启或缺少 httpx/h2 时返回 None"""
+        if not cfg2.http2:
+            return None
+        with cls.lock:
+            if cls.client is None:
+                try:
+                    import httpx
+                    limits = httpx.Limits(max_connections=cls.size(), max_keepalive_connections=cls.size())
+                    cls.client = httpx.Client(http2=True, limits=limits, timeout=cfg2.http_timeout)
+                except ImportError:
+                    logw("http2 needs `pip install httpx[http2]`, falling back to HTTP/1.1")
+                    cfg2.http2 = False
+            return cls.client
+
+    @classmethod
+    def get(cls, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", cfg2.http_timeout)
+        return cls.get_session().get(url, **kwargs)
+
+    @classmethod
+    def content(cls, url: str) -> bytes:
+        """取回整个响应体，非 2xx 状态码抛出异常"""
+        client = cls.get_client()
+        response = client.get(url) if client is not None else cls.get(url)
+        response.raise_for_status()
+        return response.content
+
+    @classmethod
+    def close(cls):
+        with cls.lock:
+            if cls.session is not None:
+                cls.session.close()
+            if cls.client is not None:
+                cls.client.close()
+            cls.session = cls.client = None
+
+
 def get_request(url: str):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/112.0.0.0 Safari/537.36 Edg/112.0.1722.39",
         "Content-Type": "text/html; charset=utf-8",
         "Referer": "https://www.doc88.com/",
     }
-    return requests.get(url, headers=headers)
+    return http_pool.get(url, headers=headers)
 
 
 def write_file(data, path):
@@ -435,6 +550,13 @@ def writes_file(data, path):
         f.close()
 
 
+def write_file_atomic(data, path):
+    """先写临时文件再替换，中途崩溃也不会留下写了一半的文件"""
+    tmp = f"{path}.tmp"
+    write_file(data, tmp)
+    os.replace(ospath(tmp), ospath(path))
+
+
 def read_file(path):
     with open(ospath(path), "r") as file:
         read = file.read()
@@ -447,9 +569,52 @@ def load_file(path):
         return read
 
 
-@retry(stop_max_attempt_number=3, wait_fixed=500)
+class budget:
+    """批量模式下所有文档共享的下载/转换并发上限，未设置时不做限制"""
+    download = None
+    convert = None
+
+    @classmethod
+    def set(cls, download: int, convert: int):
+        cls.download = threading.BoundedSemaphore(download)
+        cls.convert = threading.BoundedSemaphore(convert)
+
+    @classmethod
+    def reset(cls):
+        cls.download = cls.convert = None
+
+
+def limit(sem):
+    return sem if sem is not None else contextlib.nullcontext()
+
+
+def retryable(err: Exception) -> bool:
+    """只重试连接错误、超时与 429/5xx（requests 与 httpx 的异常都适用）"""
+    status = getattr(getattr(err, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(err, (requests.ConnectionError, requests.Timeout)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(err, httpx.TransportError)
+
+
+@retry(stop_max_attempt_number=4, wait_exponential_multiplier=500, wait_exponential_max=8000,
+       retry_on_exception=retryable)
 def download(url: str, filepath: str):
-    write_file(requests.get(url).content, filepath)
+    with limit(budget.download):
+        data = http_pool.content(url)
+    write_file(data, filepath)
+
+
+@retry(stop_max_attempt_number=4, wait_exponential_multiplier=500, wait_exponential_max=8000,
+       retry_on_exception=retryable)
+def fetch(url: str) -> bytes:
+    with limit(budget.download):
+        return http_pool.content(url)
 
 
 def extractzip(file_path: str, topath: str):
@@ -477,35 +642,113 @@ class github_release:
 # ebt文件的编号，self.level_num为层数编号，offset为内容偏移量，filesize为获取的内容长度，文件排序如下：头文件1,页文件1...重置计数...头文件2,页文件51...
 # get_more 尝试从隐藏文档中提取额外页
 
+class ebt_scanner:
+    """
+    从一个 level 的 PK 数据流中切分页面。每页由 32 字节头和一段 zlib 流组成，第一页 zlib 流的
+    前两个字节（流内偏移 32、33）作为页面标记。数据按大块喂入：当前页用增量 zlib.decompressobj
+    解压，流结束位置确定后再用 bytes.find 在其后查找下一页标记，不再逐字节比较，
+    也不再在每个候选位置把累计数据从头解压一遍。
+    feed()/finish() 返回 (offset, size, raw, pk)：页面在流内的偏移、长度、原始数据与解压后的 PK。
+    """
+
+    def __init__(self, min_size: int = 0) -> None:
+        self.min_size = min_size
+        self.buf = bytearray()
+        self.base = 0  # buf[0] 在流内的偏移
+        self.start = 0  # 当前页在流内的偏移
+        self.marker = None
+        self.dec = None
+        self.out = []
+        self.fed = 0  # 当前页已送入解压器的位置
+        self.end = None  # 当前页 zlib 流结束的位置
+        self.broken = False
+
+    def total(self) -> int:
+        return self.base + len(self.buf)
+
+    def next_page(self, pos: int):
+        self.dec = zlib.decompressobj()
+        self.out = []
+        self.fed = pos
+        self.end = None
+
+    def feed(self, chunk) -> list:
+        self.buf.extend(chunk)
+        pages = []
+        while not self.broken:
+            if self.marker is None:
+                if self.total() < 34:
+                    return pages
+                self.marker = bytes(self.buf[32:34])
+                self.next_page(32)
+            if self.end is None:
+                if self.fed < self.total():
+                    try:
+                        self.out.append(self.dec.decompress(self.buf[self.fed - self.base:]))
+                    except zlib.error:
+                        self.broken = True
+                        break
+                    self.fed = self.total()
+                if not self.dec.eof:
+                    return pages
+                self.end = self.total() - len(self.dec.unused_data)
+            # 与逐字节扫描一致：标记位置 q 需满足本页 zlib 流在 q + 2 之前结束、页长不小于 min_size
+            low = max(self.end - 2, self.start + 32 + self.min_size, 33)
+            q = self.buf.find(self.marker, low - self.base)
+            if q < 0:
+                return pages
+            q += self.base
+            pages.append((self.start, q - 32 - self.start, bytes(self.buf[self.start - self.base:q + 2 - self.base]),
+                          b"".join(self.out)))
+            self.start = q - 32
+            del self.buf[:self.start - self.base]
+            self.base = self.start
+            self.next_page(q)
+        return pages
+
+    def finish(self):
+        """数据流结束：最后一页的 zlib 流完整时返回该页，否则返回 None"""
+        if self.marker is None or self.broken or not self.dec.eof:
+            return None
+        return (self.start, self.total() - self.start, bytes(self.buf[self.start - self.base:]), b"".join(self.out))
+
+
 class get_more:
     def __init__(self, cfg: gen_cfg, level, filepath, page=0) -> None:
         self.cfg = cfg
         self.level = level
         self.chunk_size = 10240000
-        self.header = bytearray()
+        self.read_size = 1024 * 256
         self.filepath = filepath
         self.newpageids = []
         self.pagecount = page
-        self.PH_data = requests.get(self.cfg.ph(self.level).url).content
-        self.progressfile = filepath + "progress.json"
-        self.progress = {"pk": [], "ph": []}
-        self.save_progress("ph", self.level)
-        self.PK_data = bytearray()
+        self.PH_data = fetch(self.cfg.ph(self.level).url)
         self.ids = []
         return None
 
-    def read_progress(self):
-        self.progress = json.loads(read_file(self.progressfile))
-
-    def save_progress(self, type: str, page: int):
-        self.progress[type].append(page)
-        writes_file(json.dumps(self.progress), self.progressfile)
-
     def start(self):
-
+        """扫描本 level；页面先按 level 内序号保存，全局页码由 renumber() 统一分配"""
         write_file(self.PH_data, f"{self.filepath}{self.cfg.ph(self.level).name}")
-        if self.scan(self.level):
-            return self.get_newpageids()
+        return self.scan(self.level)
+
+    def scan_name(self, n: int) -> str:
+        return f"{self.filepath}scan-{self.level}-{n}.ebt"
+
+    def swf_name(self, n: int) -> str:
+        return f"{self.filepath}swf/{self.level}-{n}.swf"
+
+    def renumber(self, base: int = None):
+        """把本 level 扫描到的第 n 页重命名为全局第 base + n 页"""
+        base = self.pagecount if base is None else base
+        for n, br in enumerate(self.ids, 1):
+            page = base + n
+            offset, size = br.split("-")
+            os.replace(
+                ospath(self.scan_name(n)),
+                ospath(f"{self.filepath}getebt-{encode(f'{self.level}-{offset}-{size}-{self.cfg.p_swf}-{page}-{self.cfg.p_code}', key2)}.ebt"),
+            )
+            if os.path.exists(ospath(self.swf_name(n))):
+                os.replace(ospath(self.swf_name(n)), ospath(f"{self.filepath}swf/{page}.swf"))
 
     def scan(self, scan_range=0):
         logger.info(f"level {self.level} start scannig...")
@@ -520,80 +763,42 @@ class get_more:
         )
                 + ".ebt"
         )
-        response = requests.get(url, stream=True)
+        with http_pool.get(url, stream=True) as response:
+            return self.read(response, headsize, scan_range)
+
+    def read(self, response, headsize: int, scan_range=0):
         if response.status_code == 200:
-            with open(ospath(f"{self.filepath}cache.ebt"), "wb") as file:
-                size = 0
-                offset = 0
-                status = False
+            scanner = ebt_scanner(scan_range)
+            with open(ospath(f"{self.filepath}cache-{self.level}.ebt"), "wb") as file:
                 try:
-                    for chunk in response.iter_content(chunk_size=1):
+                    for chunk in response.iter_content(chunk_size=self.read_size):
                         if chunk:
-                            self.PK_data.extend(chunk)
-                            if 32 <= size <= 33:
-                                self.header.extend(chunk)
-                            elif size > 33:
-                                if chunk == struct.pack("B", self.header[0]):
-                                    status = True
-                                elif chunk == struct.pack("B", self.header[1]):
-                                    if status == True:
-                                        if size - 33 - offset < scan_range:
-                                            logger.info(f"pass:{size}-{size - 33 - offset}")
-                                            status = False
-                                            pass
-                                        else:
-                                            br = f"{headsize + offset}-{size - 33 - offset}"
-                                            if self.test():
-                                                write_file(
-                                                    self.PK_data,
-                                                    f"{self.filepath}getebt-{encode(f'{self.level}-{headsize + offset}-{size - offset - 33}-{self.cfg.p_swf}-{self.pagecount + len(self.ids) + 1}-{self.cfg.p_code}', key2)}.ebt",
-                                                )
-                                                self.save_progress(
-                                                    "pk",
-                                                    self.pagecount + len(self.ids) + 1,
-                                                )
-                                                self.PK_data = self.PK_data[
-                                                               size - 33 - offset:
-                                                               ]
-                                                logger.info(f"found:{br}")
-                                                self.ids.append(br)
-                                                offset = size - 33
-                                            else:
-                                                logger.info(f"zpass:{br}")
-                                                status = False
-                                                pass
-                                    else:
-                                        status = False
-                                else:
-                                    status = False
-                            size += file.write(chunk)
+                            file.write(chunk)
+                            for page in scanner.feed(chunk):
+                                self.found(headsize, *page)
+                                logger.info(f"found:{self.ids[-1]}")
                 except requests.exceptions.ChunkedEncodingError:
                     pass
-                if self.test():
-                    write_file(
-                        self.PK_data,
-                        f"{self.filepath}getebt-{encode(f'{self.level}-{headsize + offset}-{size - offset}-{self.cfg.p_swf}-{self.pagecount + len(self.ids) + 1}-{self.cfg.p_code}', key2)}.ebt",
-                    )
-                    self.save_progress("pk", self.pagecount + len(self.ids) + 1)
-                    self.ids.append(f"{headsize + offset}-{size - offset}")
-                    logger.info(f"finish:{headsize + offset}-{size - offset}")
-                else:
-                    logger.info("Except ending, is the file too big?")
-                logger.info(f"total page:{len(self.ids)}")
-                return True
+            page = scanner.finish()
+            if page:
+                self.found(headsize, *page)
+                logger.info(f"finish:{self.ids[-1]}")
+            else:
+                logger.info("Except ending, is the file too big?")
+            logger.info(f"total page:{len(self.ids)}")
+            return True
 
-    def test(self):
+    def found(self, headsize: int, offset: int, size: int, raw: bytes, pk: bytes):
+        """保存扫描到的一页：原始 .ebt 与拼好的 SWF（按 level 内序号命名）"""
+        n = len(self.ids) + 1
+        write_file(raw, self.scan_name(n))
         comp = Compressor()
-        pk = comp.decompressEBT_PK(self.PK_data)
-        ph = comp.decompressEBT_PH(self.PH_data)
-        if pk:
-            write_file(
-                comp.makeup(ph, pk),
-                f"{self.filepath}swf/{self.pagecount + len(self.ids) + 1}.swf",
-            )
-            return True
+        ph = comp.cached_header((self.cfg.p_code, self.level), lambda: self.PH_data)
+        if ph is False:
+            logw(f"Can't decompress PH {self.level}")
         else:
-            return False
+            write_file(comp.makeup(ph, pk), self.swf_name(n))
+        self.ids.append(f"{headsize + offset}-{size}")
 
     def get_newpageids(self):
         pid = f"{self.level}-{self.cfg.pageids[0].split('-')[1]}-{self.cfg.pageids[0].split('-')[2]}"
@@ -603,6 +808,30 @@ class get_more:
         return self.newpageids
 
 
+def scan_levels(cfg: gen_cfg, filepath: str) -> list:
+    """
+    并行扫描文档的全部 level（各 level 互不依赖），总耗时约等于最慢的 level；
+    全部完成后按 level 顺序分配全局页码，并原子地重写下载进度
+    """
+    def run(level: int):
+        get = get_more(cfg, level, filepath)
+        get.start()
+        return get
+
+    with ThreadPoolExecutor(max_workers=max(1, min(cfg.ph_nums(), cfg2.download_workers))) as executor:
+        scans = list(executor.map(run, range(1, cfg.ph_nums() + 1)))
+    newpageids = []
+    progress = {"pk": [], "ph": []}
+    for get in scans:
+        base = len(newpageids)
+        get.renumber(base)
+        progress["ph"].append(get.level)
+        progress["pk"] += list(range(base + 1, base + len(get.ids) + 1))
+        newpageids += get.get_newpageids()
+    progress_journal(filepath + "progress.json").reset(progress)
+    return newpageids
+
+
 if cfg2.swf2svg:
     logger.info(
         "使用 SVG 转换功能建议同时关闭 font-face 功能，否则将会导致大量转换失败，若只需要 SVG 文件可关闭清理功能，文件将会生成到文档目录下的 svg 目录")
@@ -623,9 +852,39 @@ if cfg2.swf2svg:
 
 
 class Compressor:
+    # 解压后的 PH 头缓存，键为 (p_code, level)，所有线程共享；一个文档只有 ph_nums() 个不同的头
+    ph_cache = {}
+    ph_lock = threading.Lock()
+
     def __init__(self):
         return None
 
+    def cached_header(self, key, loader):
+        """取缓存的 PH 头，未命中时调用 loader() 取得原始 PH 数据并只解压这一次"""
+        with Compressor.ph_lock:
+            header = Compressor.ph_cache.get(key)
+            if header is None:
+                header = self.decompressEBT_PH(memoryview(loader()))
+                if header is False:
+                    return False
+                Compressor.ph_cache[key] = header
+            return header
+
+    def assemble(self, key, loader, pk_data):
+        """用缓存的 PH 头加上一页 PK 数据拼出 SWF，任一部分解压失败返回 False"""
+        ph = self.cached_header(key, loader)
+        with memoryview(pk_data) as view:
+            pk = self.decompressEBT_PK(view)
+        if ph is False or pk is False:
+            return False
+        return self.makeup(ph, pk)
+
+    @classmethod
+    def drop_headers(cls, p_code):
+        with cls.ph_lock:
+            for key in [key for key in cls.ph_cache if key[0] == p_code]:
+                del cls.ph_cache[key]
+
     def processSWF(self, file_EBT, file_EBT_PK, path):
         ph = self.decompressEBT_PH(load_file(file_EBT))
         pk = self.decompressEBT_PK(load_file(file_EBT_PK))
@@ -703,31 +962,40 @@ def append_pdf(pdf: PdfWriter, file: str):
 
 class init:
     def __init__(self, config: dict) -> None:
-        cfg2.dir_path = cfg2.o_dir_path + config["p_code"] + "/"
-        cfg2.swf_path = cfg2.dir_path + cfg2.o_swf_path
-        cfg2.svg_path = cfg2.dir_path + cfg2.o_svg_path
-        cfg2.pdf_path = cfg2.dir_path + cfg2.o_pdf_path
+        # 先在本地算好路径再写回 cfg2，批量模式下并行 init 不会拿到别的文档的目录
+        dir_path = cfg2.o_dir_path + config["p_code"] + "/"
+        swf_path = dir_path + cfg2.o_swf_path
+        svg_path = dir_path + cfg2.o_svg_path
+        pdf_path = dir_path + cfg2.o_pdf_path
         try:
-            os.makedirs(ospath(cfg2.dir_path))
+            os.makedirs(ospath(dir_path))
         except FileExistsError:
             if choose("exists"):
                 pass
             else:
                 exit()
-        if not os.path.exists(ospath(f"{cfg2.dir_path}index.json")):
+        if not os.path.exists(ospath(f"{dir_path}index.json")):
             write_file(
                 bytes(json.dumps(config), encoding="utf-8"),
-                cfg2.dir_path + "index.json",
+                dir_path + "index.json",
             )
         try:
-            os.makedirs(ospath(cfg2.swf_path))
-            os.makedirs(ospath(cfg2.svg_path))
-            os.makedirs(ospath(cfg2.pdf_path))
+            os.makedirs(ospath(swf_path))
+            os.makedirs(ospath(svg_path))
+            os.makedirs(ospath(pdf_path))
         except:
             pass
+        cfg2.dir_path, cfg2.swf_path = dir_path, swf_path
+        cfg2.svg_path, cfg2.pdf_path = svg_path, pdf_path
 
 
-def main(encoded_str, more=False):
+def main(encoded_str, more=False, result=None, clean_up=False):
+    """
+    result: 传入字典时写入本文档的处理结果（批量模式的清单条目）
+    clean_up: 成功后清理本文档的缓存目录
+    """
+    if result is None:
+        result = {}
     try:
         config = json.loads(decode(encoded_str))
     except json.decoder.JSONDecodeError:
@@ -738,8 +1006,9 @@ def main(encoded_str, more=False):
         return False
     init(config)
     cfg = gen_cfg(config)
-    if os.path.exists(ospath(f"{cfg2.dir_path}index.json")):
-        cfg = gen_cfg(json.loads(read_file(f"{cfg2.dir_path}index.json")))
+    if os.path.exists(ospath(f"{cfg.dir_path}index.json")):
+        cfg = gen_cfg(json.loads(read_file(f"{cfg.dir_path}index.json")))
+    result.update(p_code=cfg.p_code, p_name=cfg.p_name, pages=int(cfg.p_pagecount))
     logger.info(f"文档名：{cfg.p_name}")
     logger.info(f"文档 ID：{cfg.p_code}")
     logger.info(f"上传日期：{cfg.p_date}")
@@ -767,10 +1036,14 @@ def main(encoded_str, more=False):
                     file_path,
                 )
                 logger.info("Saved file to " + file_path)
+                result.update(file=file_path, converted=None)
+                if clean_up:
+                    clean(cfg)
                 return True
             except Exception as err:
                 logger.error("Downlaod error: " + str(err))
                 logw("Downlaod error: " + str(err))
+                result["error"] = "Downlaod error: " + str(err)
         else:
             logger.info("Continuing...")
     if more:
@@ -778,20 +1051,14 @@ def main(encoded_str, more=False):
         should_scan = cfg2.auto_mode and cfg2.get_more
         if should_scan or choose("即将通过扫描获取页面，是否继续（否则正常下载）？ (Y/n): "):
             logger.info("尝试通过扫描获取页面...")
-            newpageids = []
-            cfg.p_count = 0
-            for i in range(1, cfg.ph_nums() + 1):
-                get = get_more(cfg, i, cfg2.dir_path, cfg.p_count)
-                get.start()
-                newpageids += get.newpageids
-                cfg.p_count += len(get.newpageids)
-                del get
+            newpageids = scan_levels(cfg, cfg.dir_path)
+            cfg.p_count = len(newpageids)
             cfg.pageids = newpageids
             config["pageInfo"] = encode(",".join(newpageids))
             config["p_count"] = cfg.p_count
-            write_file(
+            write_file_atomic(
                 bytes(json.dumps(config), encoding="utf-8"),
-                cfg2.dir_path + "index.json",
+                cfg.dir_path + "index.json",
             )
             logger.info(f"成功扫描页数：{cfg.p_count}")
             del newpageids
@@ -800,76 +1067,202 @@ def main(encoded_str, more=False):
             logger.info("普通下载模式...")
             more = False
     try:
-        if not more:
-            get_swf(cfg)
-        convert(cfg)
-        del cfg
+        if not more and cfg2.pipeline and cfg2.convert_mode != "batch":
+            pipeline(cfg)
+        else:
+            if not more:
+                get_swf(cfg)
+            convert(cfg)
+        result.update(file=cfg2.o_dir_path + special_path(cfg.p_name) + ".pdf", converted=cfg.p_count)
+        result.pop("error", None)
+        if clean_up:
+            clean(cfg)
         return True
     except Exception as err:
         logger.error(str(err))
+        result["error"] = str(err)
         return False
+    finally:
+        Compressor.drop_headers(cfg.p_code)
+
+
+class progress_journal:
+    """
+    下载进度：progress.json 为快照，progress.log 为追加式日志（每完成一个文件追加一行 "pk 12"）。
+    加载时先读快照再重放日志，崩溃留下的半行直接忽略；日志累计 compact_every 行后
+    在锁内把快照原子写回并清空日志。查询走内存中的 set。
+    """
+    def __init__(self, path: str, compact_every: int = 256) -> None:
+        self.path = path
+        self.journal = os.path.splitext(path)[0] + ".log"
+        self.compact_every = compact_every
+        self.lock = threading.Lock()
+        self.file = None
+        self.pending = 0
+        self.done = {"pk": set(), "ph": set()}
+        self.load()
+
+    def load(self):
+        if os.path.isfile(ospath(self.path)):
+            try:
+                for type, pages in json.loads(read_file(self.path)).items():
+                    self.done.setdefault(type, set()).update(pages)
+            except (json.decoder.JSONDecodeError, AttributeError):
+                logw(f"Broken progress file {self.path}, ignored")
+        if os.path.isfile(ospath(self.journal)):
+            with open(ospath(self.journal), "r") as file:
+                for line in file:
+                    parts = line.split()
+                    if line.endswith("\n") and len(parts) == 2 and parts[1].isdigit():
+                        self.done.setdefault(parts[0], set()).add(int(parts[1]))
+                        self.pending += 1
+
+    def has(self, type: str, page: int) -> bool:
+        return page in self.done[type]
+
+    def add(self, type: str, page: int):
+        with self.lock:
+            if page in self.done[type]:
+                return
+            self.done[type].add(page)
+            if self.file is None:
+                self.file = open(ospath(self.journal), "a")
+            self.file.write(f"{type} {page}\n")
+            self.file.flush()
+            self.pending += 1
+            if self.pending >= self.compact_every:
+                self.compact()
+
+    def snapshot(self) -> dict:
+        return {type: sorted(pages) for type, pages in self.done.items()}
+
+    def compact(self):
+        """需在持有锁时调用：先原子写快照再删日志，两步之间崩溃时重放日志也是幂等的"""
+        write_file_atomic(bytes(json.dumps(self.snapshot()), encoding="utf-8"), self.path)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if os.path.exists(ospath(self.journal)):
+            os.remove(ospath(self.journal))
+        self.pending = 0
+
+    def reset(self, progress: dict):
+        """用新的进度整体替换（get_more 重新编号页面后使用）"""
+        with self.lock:
+            self.done = {type: set(pages) for type, pages in progress.items()}
+            self.compact()
+
+    def close(self):
+        with self.lock:
+            if self.pending or self.file is not None:
+                self.compact()
 
 
 class downloader:
     def __init__(self, cfg: gen_cfg) -> None:
         self.cfg = cfg
-        self.downloaded = True
-        self.progressfile = cfg2.dir_path + "progress.json"
-        if os.path.isfile(ospath(self.progressfile)):
-            self.read_progress()
-        else:
-            self.progress = {"pk": [], "ph": []}
+        self.failed = {}
+        self.buffers = {}
+        self.progress = progress_journal(self.cfg.dir_path + "progress.json")
 
-    def read_progress(self):
-        try:
-            self.progress = json.loads(read_file(self.progressfile))
-        except json.decoder.JSONDecodeError:
-            self.progress = {}
+    @property
+    def downloaded(self) -> bool:
+        return not self.failed
+
+    def fail(self, name: str, err: Exception):
+        """记录重试后仍失败的文件，最后统一报告是哪些文件失败"""
+        self.failed[name] = str(err)
+        logw(f"Download {name} error: {err}")
+
+    def error(self) -> Exception:
+        names = list(self.failed)
+        more = f" (+{len(names) - 5} more)" if len(names) > 5 else ""
+        return Exception(f"Downlaod error: {', '.join(names[:5])}{more}; first error: {self.failed[names[0]]}")
 
     def save_progress(self, type: str, page: int):
-        self.progress[type].append(page)
-        writes_file(json.dumps(self.progress), self.progressfile)
+        self.progress.add(type, page)
 
     def ph(self, i: int):
         url = self.cfg.ph(i)
         logger.info(f"Downloading PH {i}: {url.url}")
-        file_path = cfg2.dir_path + url.name
-        if i in self.progress["ph"]:
+        file_path = self.cfg.dir_path + url.name
+        if self.progress.has("ph", i):
             logger.info("Using Cache...")
-            return None
+            return True
         try:
             download(url.url, file_path)
             self.save_progress("ph", i)
+            return True
         except Exception as e:
-            logw(f"Download PH {i} error: {e}")
-            self.downloaded = False
+            self.fail(f"PH {i}", e)
+            return False
 
     def pk(self, i: int):
         url = self.cfg.pk(i)
         logger.info(f"Downloading page {i}: {url.url}")
-        file_path = cfg2.dir_path + url.name
-        if i in self.progress["pk"]:
+        file_path = self.cfg.dir_path + url.name
+        if self.progress.has("pk", i):
             logger.info("Using Cache...")
-            return None
+            return True
         try:
             download(url.url, file_path)
             self.save_progress("pk", i)
+            return True
         except Exception as e:
-            logw(f"Download page {i} error: {e}")
-            self.downloaded = False
+            self.fail(f"page {i}", e)
+            return False
+
+    def assemble(self, i: int, pk_data):
+        level_num = self.cfg.ph_num(i)
+        swf = Compressor().assemble(
+            (self.cfg.p_code, level_num),
+            lambda: load_file(self.cfg.dir_path + self.cfg.ph(level_num).name),
+            pk_data,
+        )
+        if swf is False:
+            raise Exception(f"Can't decompress page {i}")
+        return swf
 
     def makeswf(self, i: int):
         try:
-            level_num = self.cfg.ph_num(i)
-            make_swf(
-                cfg2.dir_path + self.cfg.ph(level_num).name,
-                cfg2.dir_path + self.cfg.pk(i).name,
-                cfg2.swf_path + str(i) + ".swf",
-            )
+            swf = self.assemble(i, load_file(self.cfg.dir_path + self.cfg.pk(i).name))
+            write_file(swf, self.cfg.swf_path + str(i) + ".swf")
+            return True
         except Exception as e:
             logger.info(f"Can't decompress page {i}! Skipping...")
             logw(str(e))
             self.cfg.p_count -= 1
+            return False
+
+    def pk_buffer(self, i: int):
+        """内存模式下载 PK：数据留在内存缓冲中，仅在开启 resume 时落盘 .ebt 供断点续传"""
+        url = self.cfg.pk(i)
+        file_path = self.cfg.dir_path + url.name
+        try:
+            if self.progress.has("pk", i):
+                logger.info(f"Using Cache for page {i}...")
+                data = load_file(file_path)
+            else:
+                logger.info(f"Downloading page {i}: {url.url}")
+                data = fetch(url.url)
+                if cfg2.resume:
+                    write_file(data, file_path)
+                    self.save_progress("pk", i)
+            self.buffers[i] = data
+            return True
+        except Exception as e:
+            self.fail(f"page {i}", e)
+            return False
+
+    def makeswf_buffer(self, i: int, path: str):
+        """用内存中的 PK 数据和已缓存的 PH 头拼出 SWF，直接写到转换目录"""
+        try:
+            write_file(self.assemble(i, self.buffers.pop(i)), path)
+            return True
+        except Exception as e:
+            logger.info(f"Can't decompress page {i}! Skipping...")
+            logw(str(e))
+            return False
 
 
 def get_swf(cfg: gen_cfg):
@@ -883,8 +1276,9 @@ def get_swf(cfg: gen_cfg):
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for i in range(1, cfg.p_count + 1):
             executor.submit(down.pk, i)
+    down.progress.close()
     if not down.downloaded:
-        raise Exception("Downlaod error")
+        raise down.error()
     logger.info("Making pages...")
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         for i in range(1, cfg.p_count + 1):
@@ -892,10 +1286,185 @@ def get_swf(cfg: gen_cfg):
     logger.info("Donload done. (total page: " + str(cfg.p_count) + ")")
 
 
+def ffdec(*args) -> str:
+    """以参数列表调用 ffdec 命令行，返回输出日志"""
+    with limit(budget.convert):
+        result = subprocess.run(
+            ["java", "-jar", "ffdec/ffdec.jar", *[str(arg) for arg in args]],
+            capture_output=True, text=True, errors="ignore",
+        )
+    return result.stdout + result.stderr
+
+
+def link_file(src: str, dst: str):
+    """优先使用硬链接，跨设备等情况下退回复制"""
+    try:
+        os.link(ospath(src), ospath(dst))
+    except OSError:
+        shutil.copyfile(ospath(src), ospath(dst))
+
+
+def find_frame(outdir: str, name: str, fmt: str):
+    """在 ffdec 目录导出结果中查找某个 SWF 的第一帧输出文件"""
+    frame = "frames.pdf" if fmt == "pdf" else "1.svg"
+    for sub in (name, name + ".swf", ""):
+        path = os.path.join(outdir, sub, frame)
+        if os.path.isfile(ospath(path)):
+            return path
+    return None
+
+
+class ffdec_pool:
+    """
+    常驻 ffdec 转换池：收集线程把逐页提交的页面凑成批，workers 个工作线程各自把一批
+    合并为一次 ffdec 目录导出（批处理模式），JVM 启动开销按批摊薄，不再每页启动 java。
+    ffdec 没有 stdin 任务协议，所以这里以批为单位复用 JVM。
+    凑批：收到第一页后至少等待 linger 秒，之后只要工作线程都在忙就继续收集，直到有空闲线程或满 batch_size 页，
+    流水线逐页喂入时批次也不会退化成单页。
+    done(page, ok) 在每页完成后回调，失败的页面交给调用方走逐页兜底；
+    批次或回调抛出异常时，未完成的页面按失败再回调一次，仍失败时调用 failed(page)，工作线程继续运行。
+    """
+
+    def __init__(self, fmt: str, done, workers: int = 0, batch_size: int = 0, workdir: str = "",
+                 maxsize: int = 0, failed=None, linger: float = None) -> None:
+        self.fmt = fmt
+        self.done = done
+        self.failed = failed
+        self.batch_size = batch_size or cfg2.ffdec_batch_size
+        self.linger = cfg2.ffdec_batch_linger if linger is None else linger
+        self.workdir = workdir or None
+        self.jobs = queue.Queue(maxsize)
+        self.batches = queue.Queue()
+        self.idle = threading.Semaphore(0)
+        self.lock = threading.Lock()
+        self.stats = {"batches": 0, "pages": 0}
+        self.threads = []
+        for _ in range(workers or cfg2.convert_workers):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        self.collector = threading.Thread(target=self.collect, daemon=True)
+        self.collector.start()
+
+    def submit(self, page: int, swf: str, target: str):
+        self.jobs.put((page, swf, target))
+
+    def close(self):
+        """等待队列中全部页面转换完成并结束工作线程"""
+        self.jobs.put(None)
+        self.collector.join()
+        for thread in self.threads:
+            thread.join()
+
+    def collect(self):
+        stop = False
+        while not stop:
+            job = self.jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.linger
+            acquired = False
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and self.idle.acquire(blocking=False):
+                    acquired = True
+                    break
+                try:
+                    job = self.jobs.get(timeout=remaining if remaining > 0 else 0.05)
+                except queue.Empty:
+                    continue
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+            if not acquired:
+                self.idle.acquire()
+            self.batches.put(batch)
+        for _ in self.threads:
+            self.batches.put(None)
+
+    def worker(self):
+        while True:
+            self.idle.release()
+            batch = self.batches.get()
+            if batch is None:
+                break
+            with self.lock:
+                self.stats["batches"] += 1
+                self.stats["pages"] += len(batch)
+            self.execute(batch)
+
+    def execute(self, batch: list):
+        finished = set()
+
+        def done(page: int, ok: bool):
+            self.done(page, ok)
+            finished.add(page)
+
+        tmp = None
+        try:
+            tmp = tempfile.mkdtemp(prefix="ffdec_", dir=self.workdir)
+            indir = os.path.join(tmp, "in")
+            os.makedirs(indir)
+            try:
+                for page, swf, _ in batch:
+                    link_file(swf, os.path.join(indir, f"{page}.swf"))
+            except Exception as err:
+                logw(f"ffdec batch error: {err}")
+            export_frames(self.fmt, indir, batch, tmp, done)
+        except Exception as err:
+            logw(f"ffdec batch error: {err}")
+            for page, _, _ in batch:
+                if page not in finished:
+                    self.fail(page)
+        finally:
+            if tmp:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def fail(self, page: int):
+        try:
+            self.done(page, False)
+        except Exception as err:
+            logw(f"ffdec page {page} error: {err}")
+            if self.failed:
+                self.failed(page)
+
+
+def export_frames(fmt: str, indir: str, jobs: list, workdir: str, done):
+    """
+    一次 ffdec 调用导出 indir 下全部页面 SWF 的第一帧（-select 1），
+    再按文件名把输出映射回页码并移动到 jobs 中的目标路径，每页调用 done(page, ok)
+    """
+    outdir = tempfile.mkdtemp(prefix="out_", dir=workdir)
+    log = ""
+    try:
+        log = ffdec("-format", f"frame:{fmt}", "-select", "1", "-export", "frame", outdir, indir)
+    except Exception as err:
+        logw(f"ffdec export error: {err}")
+    for page, _, target in jobs:
+        frame = find_frame(outdir, str(page), fmt)
+        if frame:
+            shutil.move(ospath(frame), ospath(target))
+        else:
+            logw(f"ffdec export missed page {page}: {log}")
+        done(page, frame is not None)
+    shutil.rmtree(outdir, ignore_errors=True)
+
+
 class converter:
-    def __init__(self) -> None:
+    def __init__(self, cfg: gen_cfg = None) -> None:
+        # 未传入 cfg 时沿用 init() 设置在 cfg2 上的路径
+        self.cfg = cfg if cfg is not None else cfg2
         self.pdf = PdfWriter()
         self.pdflist = set()
+        self.fmt = "pdf"
+        self.pool = None
+        self.merger = None
+        self.timer = None
+        self.swf_path = self.cfg.swf_path
+        self.tmp_path = ""
+        self.discard_swf = False
         try:
             if cfg2.svgfontface:
                 log = os.popen(
@@ -911,22 +1480,23 @@ class converter:
     def set_swf(self, i: int):
         return os.popen(
             "java -jar ffdec/ffdec.jar -header -set frameCount 1 "
-            + r(cfg2.swf_path + str(i) + ".swf")
+            + r(self.swf_path + str(i) + ".swf")
             + " "
-            + r(cfg2.swf_path + str(i) + ".swf")
+            + r(self.swf_path + str(i) + ".swf")
         ).read()
 
     def swf2svg(self, i: int):
         def execute(num: int):
-            dirpath = cfg2.svg_path + str(num) + "/"
-            log = os.popen(
-                "java -jar ffdec/ffdec.jar -format frame:svg -select 1 -export frame "
-                + r(dirpath)
-                + " "
-                + r(cfg2.swf_path + str(num) + ".swf")
-            ).read()
+            dirpath = self.cfg.svg_path + str(num) + "/"
+            with limit(budget.convert):
+                log = os.popen(
+                    "java -jar ffdec/ffdec.jar -format frame:svg -select 1 -export frame "
+                    + r(dirpath)
+                    + " "
+                    + r(self.swf_path + str(num) + ".swf")
+                ).read()
             shutil.move(
-                ospath(dirpath + "1.svg"), ospath(cfg2.svg_path + str(i) + "_.svg")
+                ospath(dirpath + "1.svg"), ospath(self.cfg.svg_path + str(i) + "_.svg")
             )
             shutil.rmtree(ospath(dirpath))
 
@@ -943,22 +1513,23 @@ class converter:
 
     def swf2pdf(self, i: int):
         def execute(num: int):
-            dirpath = cfg2.pdf_path + str(num) + "/"
-            log = os.popen(
-                "java -jar ffdec/ffdec.jar -format frame:pdf -select 1 -export frame "
-                + r(dirpath)
-                + " "
-                + r(cfg2.swf_path + str(num) + ".swf")
-            ).read()
+            dirpath = self.cfg.pdf_path + str(num) + "/"
+            with limit(budget.convert):
+                log = os.popen(
+                    "java -jar ffdec/ffdec.jar -format frame:pdf -select 1 -export frame "
+                    + r(dirpath)
+                    + " "
+                    + r(self.swf_path + str(num) + ".swf")
+                ).read()
             shutil.move(
-                ospath(dirpath + "frames.pdf"), ospath(cfg2.pdf_path + str(i) + "_.pdf")
+                ospath(dirpath + "frames.pdf"), ospath(self.cfg.pdf_path + str(i) + "_.pdf")
             )
             shutil.rmtree(dirpath)
             shutil.move(
-                ospath(cfg2.pdf_path + str(i) + "_.pdf"),
-                ospath(cfg2.pdf_path + str(i) + ".pdf"),
+                ospath(self.cfg.pdf_path + str(i) + "_.pdf"),
+                ospath(self.cfg.pdf_path + str(i) + ".pdf"),
             )
-            self.pdflist.add(i)
+            self.page_ready(i, True)
 
         logger.info("Converting page " + str(i) + " to pdf...")
         try:
@@ -970,41 +1541,353 @@ class converter:
             except FileNotFoundError:
                 logger.info("Can't convert this page! Skipping...")
                 logw("PDF converting error: " + log)
+                self.page_ready(i, False)
 
     def svg2pdf(self, i: int):
         try:
             logger.info(f"Converting page {i} to pdf...")
-            cairosvg.svg2pdf(url=cfg2.svg_path + str(i) + "_.svg",
-                             write_to=str(ospath(cfg2.pdf_path + str(i) + ".pdf")),
+            cairosvg.svg2pdf(url=self.cfg.svg_path + str(i) + "_.svg",
+                             write_to=str(ospath(self.cfg.pdf_path + str(i) + ".pdf")),
                              )
-            self.pdflist.add(i)
+            self.page_ready(i, True)
         except FileNotFoundError:
             logger.info("Can't convert this page! Skipping...")
+            self.page_ready(i, False)
+
+    def workdir(self):
+        if self.tmp_path:
+            return str(ospath(self.tmp_path))
+        return str(ospath(self.cfg.pdf_path if self.fmt == "pdf" else self.cfg.svg_path))
+
+    def target(self, i: int):
+        if self.fmt == "pdf":
+            return self.cfg.pdf_path + str(i) + ".pdf"
+        return self.cfg.svg_path + str(i) + "_.svg"
+
+    def fallback(self, i: int):
+        """逐页转换：启动一次 ffdec 转换单页，svg 模式下随后转为 pdf"""
+        if self.fmt == "pdf":
+            self.swf2pdf(i)
+        else:
+            self.swf2svg(i)
+            self.svg2pdf(i)
+
+    def start_pool(self, fmt: str, maxsize: int = 0):
+        self.fmt = fmt
+        self.pool = ffdec_pool(fmt, self.pool_done, workdir=self.workdir(), maxsize=maxsize,
+                               failed=lambda i: self.page_ready(i, False))
+
+    def pool_submit(self, i: int):
+        self.pool.submit(i, self.swf_path + str(i) + ".swf", self.target(i))
+
+    def pool_done(self, i: int, ok: bool):
+        if ok:
+            logger.info(f"Converted page {i} to {self.fmt}.")
+            if self.fmt == "pdf":
+                self.page_ready(i, True)
+            else:
+                self.svg2pdf(i)
+        else:
+            self.fallback(i)
+
+    def batch_export(self, fmt: str, count: int):
+        """整目录模式：一次 ffdec 调用转换 swf 目录下的全部页面，失败的页面再逐页兜底"""
+        self.fmt = fmt
+        failed = []
+
+        def done(i: int, ok: bool):
+            if ok:
+                self.pool_done(i, ok)
+            else:
+                failed.append(i)
+
+        logger.info(f"Converting {count} pages to {fmt} in one ffdec call...")
+        jobs = [(i, None, self.target(i)) for i in range(1, count + 1)]
+        export_frames(fmt, str(ospath(self.swf_path)), jobs, self.workdir(), done)
+        if failed:
+            logger.info(f"{len(failed)} pages failed in batch export, converting them one by one...")
+            with ThreadPoolExecutor(max_workers=cfg2.convert_workers) as executor:
+                for i in failed:
+                    executor.submit(self.fallback, i)
+
+    def page_ready(self, i: int, ok: bool):
+        """页面 PDF 生成（或确定失败）后调用，交给合并线程按页码顺序合并"""
+        if ok:
+            self.pdflist.add(i)
+        if self.discard_swf:
+            try:
+                os.remove(ospath(self.swf_path + str(i) + ".swf"))
+            except OSError:
+                pass
+        if self.timer:
+            self.timer.tick()
+        if self.merger:
+            self.merger.add(i, ok)
 
     def makepdf(self):
-        for i in self.pdflist:
-            self.pdf = append_pdf(self.pdf, str(ospath(cfg2.pdf_path + str(i) + ".pdf")))
+        for i in sorted(self.pdflist):
+            self.pdf = append_pdf(self.pdf, str(ospath(self.cfg.pdf_path + str(i) + ".pdf")))
+
+
+class pdf_merger:
+    """
+    流式合并 PDF：转换线程每完成一页就调用 add(page, ok)，合并线程按页码顺序把已就绪的页面
+    追加到当前分块，转换仍在进行时就开始合并。每满 merge_chunk_pages 页把分块写到磁盘并释放，
+    内存只保留一个分块；close() 等待剩余页面后按顺序拼接分块。
+    拼接多个分块需要 qpdf 才能保持内存有界：没有 qpdf 时退回 pypdf，会把全部分块读入同一个 PdfWriter，
+    峰值内存随整本文档增长（会输出警告）。
+    """
+
+    def __init__(self, count: int, out_path: str, workdir: str, chunk_pages: int = None) -> None:
+        self.count = count
+        self.out_path = out_path
+        self.workdir = workdir
+        self.chunk_pages = cfg2.merge_chunk_pages if chunk_pages is None else chunk_pages
+        self.ready = {}
+        self.closing = False
+        self.cond = threading.Condition()
+        self.chunks = []
+        self.writer = PdfWriter()
+        self.in_chunk = 0
+        self.merged = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, page: int, ok: bool = True):
+        with self.cond:
+            self.ready[page] = ok
+            self.cond.notify()
+
+    def run(self):
+        for page in range(1, self.count + 1):
+            with self.cond:
+                while page not in self.ready and not self.closing:
+                    self.cond.wait()
+                ok = self.ready.pop(page, False)
+            if not ok:
+                continue
+            try:
+                self.writer = append_pdf(self.writer, str(ospath(self.workdir + str(page) + ".pdf")))
+                self.in_chunk += 1
+                self.merged += 1
+            except Exception as err:
+                logw(f"Merge page {page} error: {err}")
+            if self.chunk_pages and self.in_chunk >= self.chunk_pages:
+                self.flush()
+        self.flush()
+
+    def flush(self):
+        if not self.in_chunk and self.chunks:
+            return
+        path = os.path.join(self.workdir, f"_chunk_{len(self.chunks) + 1}.pdf")
+        self.writer.write(str(ospath(path)))
+        self.chunks.append(path)
+        self.writer = PdfWriter()
+        self.in_chunk = 0
+
+    def close(self, write: bool = True):
+        """
+        转换全部结束后调用：未上报的页面视为失败，写出最终 PDF；write=False 时只清理分块。
+        重复调用无效果，异常路径可在 finally 中再调用一次结束合并线程
+        """
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.closing = True
+            self.cond.notify()
+        self.thread.join()
+        if not write:
+            pass
+        elif len(self.chunks) == 1:
+            shutil.move(ospath(self.chunks[0]), ospath(self.out_path))
+        elif not (shutil.which("qpdf") and subprocess.run(
+                ["qpdf", "--empty", "--pages", *[str(ospath(c)) for c in self.chunks], "--",
+                 str(ospath(self.out_path))]).returncode == 0):
+            logw(f"qpdf unavailable, merging {len(self.chunks)} chunks in memory with pypdf; "
+                 "install qpdf to keep memory bounded")
+            pdf = PdfWriter()
+            for chunk in self.chunks:
+                pdf = append_pdf(pdf, chunk)
+            pdf.write(str(ospath(self.out_path)))
+        for chunk in self.chunks:
+            if os.path.exists(ospath(chunk)):
+                os.remove(ospath(chunk))
+        if write:
+            logger.info(f"Merged {self.merged}/{self.count} pages.")
 
 
 def convert(cfg: gen_cfg):
     logger.info("开始转换...")
     max_workers = cfg2.convert_workers
-    doc = converter()
-    if not cfg2.swf2svg:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for i in range(1, cfg.p_count + 1):
-                executor.submit(doc.swf2pdf, i)
-    else:
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            for i in range(1, cfg.p_count + 1):
-                executor.submit(doc.swf2svg, i)
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    doc = converter(cfg)
+    pdf_name = cfg2.o_dir_path + special_path(cfg.p_name) + ".pdf"
+    doc.merger = pdf_merger(cfg.p_count, pdf_name, cfg.pdf_path)
+    try:
+        if cfg2.convert_mode == "pool":
+            doc.start_pool("svg" if cfg2.swf2svg else "pdf")
             for i in range(1, cfg.p_count + 1):
-                executor.submit(doc.svg2pdf, i)
-    logger.info("Now start making pdf, please wait...")
-    doc.makepdf()
+                doc.pool_submit(i)
+            doc.pool.close()
+        elif cfg2.convert_mode == "batch":
+            doc.batch_export("svg" if cfg2.swf2svg else "pdf", cfg.p_count)
+        elif not cfg2.swf2svg:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i in range(1, cfg.p_count + 1):
+                    executor.submit(doc.swf2pdf, i)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i in range(1, cfg.p_count + 1):
+                    executor.submit(doc.swf2svg, i)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i in range(1, cfg.p_count + 1):
+                    executor.submit(doc.svg2pdf, i)
+        logger.info("Now start making pdf, please wait...")
+        doc.merger.close()
+    finally:
+        # 异常时结束合并线程并清理分块（正常路径已 close，这里不再生效）
+        doc.merger.close(write=False)
+    logger.info("转换完成！")
+    logger.info("已将文件保存至 " + pdf_name)
+
+
+class stage_timer:
+    """记录流水线某个阶段的首页耗时与总耗时（均从流水线启动时刻算起）"""
+
+    def __init__(self, name: str, start: float) -> None:
+        self.name = name
+        self.start = start
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.lock = threading.Lock()
+
+    def tick(self):
+        with self.lock:
+            self.count += 1
+            self.last = time.time() - self.start
+            if self.first is None:
+                self.first = self.last
+
+    def report(self):
+        if self.first is None:
+            logger.info(f"[{self.name}] 未处理任何页面")
+        else:
+            logger.info(f"[{self.name}] {self.count} 页，首页 {self.first:.2f}s，总耗时 {self.last:.2f}s")
+
+
+class stage:
+    """流水线阶段：workers 个线程从有界队列取页码执行 func(page)，队列满时阻塞上游形成背压"""
+
+    def __init__(self, name: str, func, workers: int, start: float, maxsize: int = 0) -> None:
+        self.func = func
+        self.timer = stage_timer(name, start)
+        self.jobs = queue.Queue(maxsize)
+        self.threads = []
+        for _ in range(max(1, workers)):
+            thread = threading.Thread(target=self.worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, page: int):
+        self.jobs.put(page)
+
+    def worker(self):
+        while True:
+            page = self.jobs.get()
+            if page is None:
+                break
+            try:
+                self.func(page)
+            except Exception as err:
+                logw(f"[{self.timer.name}] page {page} error: {err}")
+            self.timer.tick()
+
+    def close(self):
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+def pipeline(cfg: gen_cfg):
+    """
+    流水线模式：每页 PK 下载完成后立即解压为 SWF、交给 ffdec 转换并进入流式合并，
+    阶段之间用有界队列衔接，慢页面只拖慢自己，不再阻塞整本文档的每一个阶段。
+    下载并发取 download_workers，解压与转换并发取 convert_workers。
+    """
+    start = time.time()
+    size = cfg2.download_workers + cfg2.convert_workers
+    fmt = "svg" if cfg2.swf2svg else "pdf"
+    down = downloader(cfg)
+    doc = converter(cfg)
     pdf_name = cfg2.o_dir_path + special_path(cfg.p_name) + ".pdf"
-    doc.pdf.write(str(ospath(pdf_name)))
+    logger.info("Downloading PH...")
+    with ThreadPoolExecutor(max_workers=cfg2.download_workers) as executor:
+        for i in range(1, cfg.ph_nums() + 1):
+            executor.submit(down.ph, i)
+
+    tmp_dir = None
+    if cfg2.in_memory:
+        # SWF 只作为 ffdec 的输入，放到 tmpfs 上，转换完成即删除
+        tmpfs = cfg2.tmpfs_path if os.path.isdir(cfg2.tmpfs_path) else cfg.dir_path
+        tmp_dir = tempfile.mkdtemp(prefix=f"doc88_{cfg.p_code}_", dir=tmpfs)
+        doc.swf_path = doc.tmp_path = os.path.join(tmp_dir, "")
+        doc.discard_swf = True
+        fetch_page = down.pk_buffer
+        make_page = lambda i: down.makeswf_buffer(i, doc.swf_path + str(i) + ".swf")
+    else:
+        fetch_page = down.pk
+        make_page = down.makeswf
+
+    doc.merger = pdf_merger(cfg.p_count, pdf_name, cfg.pdf_path)
+    try:
+        if cfg2.convert_mode == "pool":
+            doc.start_pool(fmt, maxsize=size)
+            doc.timer = stage_timer("convert", start)
+            to_convert = doc.pool_submit
+        else:
+            doc.fmt = fmt
+            converting = stage("convert", doc.fallback, cfg2.convert_workers, start, maxsize=size)
+            to_convert = converting.put
+
+        def make(i: int):
+            if make_page(i):
+                to_convert(i)
+            else:
+                doc.page_ready(i, False)
+
+        def fetch(i: int):
+            if fetch_page(i):
+                making.put(i)
+            else:
+                doc.page_ready(i, False)
+
+        making = stage("decompress", make, cfg2.convert_workers, start, maxsize=size)
+        fetching = stage("download", fetch, cfg2.download_workers, start)
+        logger.info("Downloading and converting pages...")
+        for i in range(1, cfg.p_count + 1):
+            fetching.put(i)
+        fetching.close()
+        down.progress.close()
+        making.close()
+        if doc.pool:
+            doc.pool.close()
+            timers = [fetching.timer, making.timer, doc.timer]
+        else:
+            converting.close()
+            timers = [fetching.timer, making.timer, converting.timer]
+        for timer in timers:
+            timer.report()
+        doc.merger.close(write=down.downloaded)
+        if not down.downloaded:
+            raise down.error()
+    finally:
+        # 任何阶段异常都要结束合并线程，并清理 tmpfs 上的 SWF 目录，否则批量时会持续占用内存
+        doc.merger.close(write=False)
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
     logger.info("转换完成！")
     logger.info("已将文件保存至 " + pdf_name)
 
@@ -1017,7 +1900,7 @@ def clean(cfg2):
     for i in os.listdir(ospath(cfg2.dir_path)):
         if i.endswith(".ebt"):
             os.remove(ospath(cfg2.dir_path + i))
-        elif i == "progress.json":
+        elif i in ("progress.json", "progress.log", "progress.json.tmp"):
             os.remove(ospath(cfg2.dir_path + i))
 
 
@@ -1059,14 +1942,8 @@ class mode:
             return False
 
 
-def get_pdf(url=None):
-    """
-    下载 doc88 文档的主函数
-
-    参数:
-        url: doc88 文档的 URL，例如 "https://www.doc88.com/p-74787813372750.html"
-            如果为 None，则进入交互模式
-    """
+def prepare():
+    """环境检查与 ffdec/版本更新，每个进程只需执行一次"""
     update = Update(cfg2)
     logger.info(f"update.check_java()的状态： update.check_java()")
     if not update.check_java():
@@ -1076,6 +1953,100 @@ def get_pdf(url=None):
     if cfg2.check_update:
         update.check_update()
     update.upgrade()
+    return update
+
+
+def read_batch(items) -> list:
+    """批量输入：URL / p_code 列表，或每行一个 URL / p_code 的文本文件（# 开头为注释）"""
+    if isinstance(items, str):
+        items = read_file(items).splitlines()
+    urls = []
+    for item in items:
+        item = item.strip()
+        if not item or item.startswith("#"):
+            continue
+        if not item.startswith("http"):
+            item = f"https://www.doc88.com/p-{item}.html"
+        urls.append(item)
+    return urls
+
+
+def get_pdf_batch(items, manifest_path=None, max_docs=None):
+    """
+    批量下载多个 doc88 文档
+
+    环境检查与 gen_indexs 只执行一次；同时处理 batch_docs 个文档，
+    所有文档的下载与 ffdec 转换共用 batch_download_workers / batch_convert_workers 的全局并发上限。
+    每个文档的结果（p_code、文件路径、页数、耗时、错误）写入清单文件，默认 docs/batch_manifest.json。
+    多个文档在线程中并行处理，不能交互确认，批量期间强制 auto_mode=True，结束后恢复。
+
+    参数:
+        items: URL / p_code 列表，或每行一个 URL / p_code 的文本文件路径
+        manifest_path: 结果清单路径
+        max_docs: 同时处理的文档数，默认取 cfg2.batch_docs
+    """
+    urls = read_batch(items)
+    manifest_path = manifest_path or cfg2.o_dir_path + "batch_manifest.json"
+    auto_mode = cfg2.auto_mode
+    if not auto_mode:
+        logger.info("批量模式不支持交互确认，已临时启用 auto_mode")
+        cfg2.auto_mode = True
+    try:
+        return run_batch(urls, manifest_path, max_docs)
+    finally:
+        cfg2.auto_mode = auto_mode
+
+
+def run_batch(urls: list, manifest_path: str, max_docs=None) -> list:
+    update = prepare()
+    os.makedirs(ospath(cfg2.o_dir_path), exist_ok=True)
+    budget.set(
+        cfg2.batch_download_workers or cfg2.download_workers,
+        cfg2.batch_convert_workers or cfg2.convert_workers,
+    )
+
+    def run(url: str) -> dict:
+        result = {"url": url}
+        start = time.time()
+        logger.info(f"开始处理 URL: {url}")
+        try:
+            result["ok"] = main(get_cfg(url).data, cfg2.get_more, result, clean_up=cfg2.clean)
+        except Exception as err:
+            logger.error(f"处理 URL 时出错: {err}")
+            result["ok"] = False
+            result["error"] = str(err)
+        if not result["ok"]:
+            result.setdefault("error", "unknown error")
+        result["seconds"] = round(time.time() - start, 2)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_docs or cfg2.batch_docs) as executor:
+            results = list(executor.map(run, urls))
+    finally:
+        budget.reset()
+    update.gen_indexs()
+    write_file_atomic(
+        bytes(json.dumps(results, ensure_ascii=False, indent=4), encoding="utf-8"),
+        manifest_path,
+    )
+    done = sum(1 for result in results if result["ok"])
+    logger.info(f"批量处理完成：{done}/{len(results)}，清单已保存至 {manifest_path}")
+    return results
+
+
+def get_pdf(url=None):
+    """
+    下载 doc88 文档的主函数
+
+    参数:
+        url: doc88 文档的 URL，例如 "https://www.doc88.com/p-74787813372750.html"
+            如果为 None，则进入交互模式；命令行传入 -b <文件> 时进入批量模式
+    """
+    a = sys.argv
+    if url is None and "-b" in a and a.index("-b") + 1 < len(a):
+        return get_pdf_batch(a[a.index("-b") + 1])
+    update = prepare()
 
     # 如果传入了 URL，直接使用它
     if url:
@@ -1095,7 +2066,6 @@ def get_pdf(url=None):
             return False
 
     # 如果没有传入 URL，进入原有的交互模式
-    a = sys.argv
     user = mode()
     if len(a) == 1:
         exe = user.url
@@ -0,0 +1,339 @@
+import atexit
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+
+from loguru import logger
+
+# 尝试导入uno（LibreOffice 自带的 Python 或 python3-uno 提供）
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+
+    UNO_AVAILABLE = True
+except ImportError:
+    UNO_AVAILABLE = False
+
+# 目标格式 -> LibreOffice 导出过滤器
+EXPORT_FILTERS = {
+    "docx": "MS Word 2007 XML",
+    "doc": "MS Word 97",
+    "pdf": "writer_pdf_Export",
+}
+
+# 未配置 SOFFICE_PATH 且 PATH 中找不到时依次尝试的位置
+SOFFICE_CANDIDATES = [
+    r"D:\software\Libre\program\soffice.exe",
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    "/usr/bin/soffice",
+    "/usr/lib/libreoffice/program/soffice",
+    "/opt/libreoffice/program/soffice",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+]
+
+
+def find_soffice(soffice_path=None):
+    """soffice 路径：参数 > 环境变量 SOFFICE_PATH > PATH 中的 soffice/libreoffice > 常见安装位置"""
+    for path in (soffice_path, os.environ.get("SOFFICE_PATH"),
+                 shutil.which("soffice"), shutil.which("libreoffice")):
+        if path:
+            return path
+    for path in SOFFICE_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError("未找到 LibreOffice（soffice），请安装或设置环境变量 SOFFICE_PATH")
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _SofficeInstance:
+    """
+    一个 soffice 工作实例，独占一个用户配置目录（多个实例共用配置目录会互相阻塞）：
+    - uno 模式：常驻 soffice 进程监听本地端口，通过 UNO 打开/另存文档，不再每个文件冷启动
+    - spawn 模式：没有 uno 模块时每个文件启动一次 soffice --convert-to，但复用已初始化的配置目录
+    """
+
+    def __init__(self, soffice_path, use_uno, startup_timeout=60):
+        self.soffice_path = soffice_path
+        self.use_uno = use_uno
+        self.startup_timeout = startup_timeout
+        self.profile_dir = tempfile.mkdtemp(prefix="soffice_profile_")
+        self.process = None
+        self.desktop = None
+        self.started = False
+
+    def _base_args(self):
+        return [
+            self.soffice_path,
+            f"-env:UserInstallation={Path(self.profile_dir).as_uri()}",
+            "--headless", "--invisible", "--norestore", "--nologo", "--nodefault", "--nolockcheck",
+        ]
+
+    def alive(self):
+        if not self.use_uno:
+            return True
+        return self.process is not None and self.process.poll() is None and self.desktop is not None
+
+    def start(self):
+        if not self.use_uno:
+            return
+        self.started = True
+        port = _free_port()
+        self.process = subprocess.Popen(
+            self._base_args() + [f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("soffice 启动失败")
+                time.sleep(0.2)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        logger.info(f"soffice 常驻实例已启动（pid={self.process.pid}, port={port}）")
+
+    def stop(self):
+        """结束进程（超时或崩溃后由看门狗/重启逻辑调用）"""
+        self.desktop = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        self.process = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def convert(self, in_path, out_path, target, timeout):
+        if self.use_uno:
+            self._convert_uno(in_path, out_path, target, timeout)
+        else:
+            self._convert_spawn(in_path, out_path, target, timeout)
+
+    @staticmethod
+    def _prop(name, value):
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        return prop
+
+    def _convert_uno(self, in_path, out_path, target, timeout):
+        # 超时由看门狗结束进程，阻塞中的 UNO 调用随之抛错
+        expired = threading.Event()
+
+        def kill():
+            expired.set()
+            self.stop()
+
+        watchdog = threading.Timer(timeout, kill)
+        watchdog.start()
+        try:
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(in_path), "_blank", 0,
+                (self._prop("Hidden", True), self._prop("ReadOnly", True)),
+            )
+            if doc is None:
+                raise RuntimeError("soffice 无法打开文档")
+            try:
+                doc.storeToURL(uno.systemPathToFileUrl(out_path), (self._prop("FilterName", EXPORT_FILTERS[target]),))
+            finally:
+                doc.close(True)
+        except Exception as e:
+            if expired.is_set():
+                raise TimeoutError(f"转换超时（{timeout}秒）")
+            raise e
+        finally:
+            watchdog.cancel()
+
+    def _convert_spawn(self, in_path, out_path, target, timeout):
+        out_dir = os.path.dirname(out_path)
+        result = subprocess.run(
+            self._base_args() + ["--convert-to", f"{target}:{EXPORT_FILTERS[target]}", "--outdir", out_dir, in_path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", errors="replace",
+            timeout=timeout,
+        )
+        if result.returncode != 0:
+            logger.error(f"soffice stdout：{result.stdout}")
+            logger.error(f"soffice stderr：{result.stderr}")
+            raise RuntimeError(f"转换失败（代码：{result.returncode}）")
+        produced = os.path.join(out_dir, Path(in_path).stem + "." + target)
+        if produced != out_path and os.path.exists(produced):
+            os.replace(produced, out_path)
+
+
+class OfficeConverter:
+    """
+    常驻的 LibreOffice 转换服务：workers 个 soffice 实例从同一个任务队列取任务，
+    每个任务有超时，实例崩溃或超时后自动重启（restart_window 秒内最多 max_restarts 次，超过时当前任务失败，
+    窗口滑过后恢复重启，长时间运行不会因累计崩溃次数而永久停用）。
+    有 uno 模块时实例常驻（UNO 模式），否则每个任务启动一次 soffice（spawn 模式）。
+
+        converter = OfficeConverter(workers=2)
+        docx_bytes = converter.convert(doc_bytes)             # 阻塞等待
+        future = converter.submit(doc_bytes, target="pdf")    # 异步提交
+    """
+
+    def __init__(self, soffice_path=None, workers=1, timeout=120, use_uno=None, max_restarts=10,
+                 startup_timeout=60, restart_window=600):
+        self.soffice_path = find_soffice(soffice_path)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.use_uno = UNO_AVAILABLE if use_uno is None else use_uno
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self._restart_times = deque()
+        self.startup_timeout = startup_timeout
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.stats = {'converted': 0, 'failed': 0, 'restarts': 0}
+        self.closed = False
+
+    def _start_workers(self):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("转换服务已关闭")
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"soffice-worker-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, content, source_ext="doc", target="docx", timeout=None):
+        """提交转换任务，返回 Future，结果为转换后的字节"""
+        if target not in EXPORT_FILTERS:
+            raise ValueError(f"不支持的目标格式：{target}")
+        self._start_workers()
+        future = Future()
+        self.jobs.put((content, source_ext, target, timeout or self.timeout, future))
+        return future
+
+    def convert(self, content, source_ext="doc", target="docx", timeout=None):
+        """转换并等待结果（排队时间不计入单个任务的超时）"""
+        return self.submit(content, source_ext, target, timeout).result()
+
+    def _restart(self, instance):
+        instance.stop()
+        now = time.monotonic()
+        with self.lock:
+            while self._restart_times and now - self._restart_times[0] > self.restart_window:
+                self._restart_times.popleft()
+            if len(self._restart_times) >= self.max_restarts:
+                raise RuntimeError(f"soffice 在 {self.restart_window} 秒内重启已达 {self.max_restarts} 次，暂缓重启")
+            self._restart_times.append(now)
+            # stats['restarts'] 只做累计统计，不参与限制
+            self.stats['restarts'] += 1
+        instance.start()
+
+    def _worker(self):
+        instance = _SofficeInstance(self.soffice_path, self.use_uno, self.startup_timeout)
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    break
+                content, source_ext, target, timeout, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = self._run(instance, content, source_ext, target, timeout)
+                except Exception as e:
+                    with self.lock:
+                        self.stats['failed'] += 1
+                    future.set_exception(e)
+                else:
+                    with self.lock:
+                        self.stats['converted'] += 1
+                    future.set_result(result)
+        finally:
+            instance.close()
+
+    def _run(self, instance, content, source_ext, target, timeout):
+        with tempfile.TemporaryDirectory(prefix="soffice_job_") as job_dir:
+            in_path = os.path.join(job_dir, f"input.{source_ext}")
+            out_dir = os.path.join(job_dir, "out")
+            os.makedirs(out_dir)
+            out_path = os.path.join(out_dir, f"input.{target}")
+            Path(in_path).write_bytes(content)
+            for attempt in range(2):
+                if not instance.alive():
+                    if instance.started:
+                        self._restart(instance)
+                    else:
+                        instance.start()
+                try:
+                    instance.convert(in_path, out_path, target, timeout)
+                    break
+                except (TimeoutError, subprocess.TimeoutExpired):
+                    # 超时的文档大概率再次超时，重启实例后直接报错
+                    if instance.use_uno:
+                        self._restart(instance)
+                    raise TimeoutError(f"转换超时（{timeout}秒）")
+                except Exception as e:
+                    # 实例崩溃时重启后重试一次；实例正常说明是文档本身的问题
+                    if attempt or instance.alive():
+                        raise e
+                    logger.warning(f"soffice 实例异常（{e}），重启后重试")
+            if not os.path.exists(out_path):
+                raise RuntimeError("转换后文件未生成")
+            return Path(out_path).read_bytes()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.jobs.put(None)
+        for thread in threads:
+            thread.join()
+
+
+_default_converter = None
+_default_lock = threading.Lock()
+
+
+def get_converter():
+    """
+    进程内共享的转换服务，首次调用时创建；实例数取环境变量 SOFFICE_WORKERS（默认 1），
+    单个任务超时取 SOFFICE_TIMEOUT（秒，默认 120）
+    """
+    global _default_converter
+    with _default_lock:
+        if _default_converter is None:
+            _default_converter = OfficeConverter(
+                workers=int(os.environ.get("SOFFICE_WORKERS", "1")),
+                timeout=float(os.environ.get("SOFFICE_TIMEOUT", "120")),
+            )
+            # 退出时结束常驻的 soffice 进程并清理配置目录
+            atexit.register(close_converter)
+        return _default_converter
+
+
+def close_converter():
+    global _default_converter
+    with _default_lock:
+        if _default_converter is not None:
+            _default_converter.close()
+            _default_converter = None
@@ -60,6 +60,20 @@ class OSSManager:
         else:
             logger.error(f"文件 {oss_path} 上传到 OSS 失败，状态码: {result.status}")
 
+    def upload_archive_to_oss(self, source, archive_name, file_type, **kwargs):
+        """
+        流式解压并逐个上传成员（不把成员整体读入内存），OSS 路径为 directory/压缩包名/成员路径，
+        返回 [(file_url, 成员名)]。kwargs 同 iter_archive（max_member_size/max_total_size/extensions）
+        """
+        results = []
+        for member in iter_archive(source, archive_name, file_type, **kwargs):
+            oss_name = "/".join(clean_name(part) for part in member.name.replace('\\', '/').split('/')
+                                if part not in ('', '.', '..'))
+            with member.open() as f:
+                file_url = self.upload_file_to_oss(f, oss_name)
+            results.append((file_url, member.name))
+        return results
+
     def get_file_url(self, file_path):
         file_url = f"http://{self.bucket.bucket_name}.{self.bucket.endpoint.split('//')[1]}/{file_path}"
         return file_url
@@ -92,14 +106,25 @@ class OSSManager:
     def detect_file_type(self, response, item_data):
         file_name = item_data['file_name']
         file_url = item_data['file_url']
-        file_type = start_detect_file_type(file_url=file_url,file_name=file_name)
+        # 响应内容已下载，类型识别直接复用，不再重复请求
+        file_type = start_detect_file_type(file_url=file_url, file_name=file_name, content=response.content)
         if not file_type:
             file_name = get_filename_from_response(response)
-            file_type = start_detect_file_type(file_url=file_url, file_name=file_name)
-        supported_extensions = ('zip', 'tar', 'tar.gz', 'tgz', 'tar.bz2', 'tbz2', 'rar', 'gz')
+            file_type = start_detect_file_type(file_url=file_url, file_name=file_name, content=response.content)
+        supported_extensions = ('zip', 'tar', 'tar.gz', 'tgz', 'tar.bz2', 'tbz2', 'tar.xz', 'txz',
+                                'rar', 'gz', 'bz2', 'xz', '7z')
         if file_type in supported_extensions:
-            extracted_files = extract_archive(response.content, file_name, file_type)
-            for content, new_name in extracted_files:
+            # 只处理第一个成员，流式解压时其余成员不会被读取
+            try:
+                members = iter_archive(response.content, file_name, file_type)
+                member = next(members, None)
+                extracted = (member.read(), member.name) if member is not None else None
+                members.close()
+            except Exception as e:
+                logger.error(f"处理压缩包 {file_name} 时出错: {e}")
+                extracted = None
+            if extracted:
+                content, new_name = extracted
                 item_data['md5_hash'] = calculate_md5(content)
                 valid_oss_filename = validate_and_fix_filename(new_name)
                 valid_oss_filename = self.get_new_name(valid_oss_filename, item_data['md5_hash'])
@@ -157,7 +182,7 @@ class OSSManager:
         :param base_url: 基础 URL
         :return: 替换后的 HTML 文本
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = parse_html(html_content)
         img_tags = soup.find_all('img')
         for img in img_tags:
             src = img.get('src')
@@ -178,6 +203,6 @@ class OSSManager:
         #     'Connection': 'keep-alive',
         #     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0',
         # }
-        response = requests.get(url, timeout=60, verify=False)
+        response = cached_get(url, timeout=60, verify=False)
         response.raise_for_status()
         return response
@@ -0,0 +1,89 @@
+"""
+在本地桩 HTTP 服务上对比 FileDownloader 逐个下载与 AsyncFileDownloader 并发下载的吞吐，并校验两者结果一致。
+
+用法（在仓库根目录运行，PYTHONPATH=. 使脚本能导入 spider_tools）：
+    PYTHONPATH=. python test/bench_async_download.py --files 500 --size 20000 --latency 0.01 --per-host 16
+"""
+import argparse
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from spider_tools.async_file_download import AsyncFileDownloader
+from spider_tools.file_download import FileDownloader
+
+
+class stub_handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    size = 20000
+    latency = 0.0
+
+    def body(self):
+        # 每个文件内容不同，便于校验结果一致
+        return self.path.encode().ljust(self.size, b"\0")
+
+    def send_body(self, head=False):
+        time.sleep(self.latency)
+        body = self.body()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.send_body()
+
+    def do_HEAD(self):
+        self.send_body(head=True)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_sync(urls):
+    downloader = FileDownloader()
+    return [downloader.download_bytes(url) for url in urls]
+
+
+async def run_async(urls, per_host):
+    async with AsyncFileDownloader(per_host_limit=per_host) as downloader:
+        return await asyncio.gather(*[downloader.download_bytes(url) for url in urls])
+
+
+def report(name, results, cost):
+    ok = sum(1 for success, _ in results if success)
+    print(f"{name:<8} {ok:>5}/{len(results)} files  {cost:8.2f}s  {len(results) / cost:8.1f} files/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size", type=int, default=20000, help="每个文件的字节数（需不小于 min_valid_size）")
+    parser.add_argument("--latency", type=float, default=0.01, help="桩服务每个请求的模拟延迟（秒）")
+    parser.add_argument("--per-host", type=int, default=16)
+    args = parser.parse_args()
+
+    stub_handler.size = args.size
+    stub_handler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub_handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_address[1]}/files/{i}.pdf" for i in range(args.files)]
+
+    try:
+        start = time.perf_counter()
+        sync_results = run_sync(urls)
+        sync_cost = time.perf_counter() - start
+        report("sync", sync_results, sync_cost)
+
+        start = time.perf_counter()
+        async_results = asyncio.run(run_async(urls, args.per_host))
+        async_cost = time.perf_counter() - start
+        report("async", async_results, async_cost)
+
+        print(f"speedup: {sync_cost / async_cost:.1f}x, results match: {sync_results == list(async_results)}")
+    finally:
+        server.shutdown()
@@ -0,0 +1,106 @@
+"""
+在合成的多页 EBT 数据流上对比 get_more 旧的逐字节扫描与 ebt_scanner 分块扫描，
+并校验两者切分出的页面边界一致。
+
+用法（在仓库根目录运行，PYTHONPATH=. 使脚本能导入 spider_tools）：
+    PYTHONPATH=. python test/bench_ebt_scan.py --pages 30 --page-size 40000
+"""
+import argparse
+import os
+import random
+import struct
+import time
+import zlib
+
+from spider_tools.get_pdf import ebt_scanner
+
+
+def make_stream(pages, page_size, seed=0):
+    """每页：32 字节页头 + 一段 zlib 流；页面内容半随机，使压缩数据中偶尔出现伪标记"""
+    rnd = random.Random(seed)
+    words = [bytes(rnd.randrange(256) for _ in range(rnd.randrange(3, 12))) for _ in range(500)]
+    stream = bytearray()
+    for _ in range(pages):
+        body = bytearray()
+        while len(body) < page_size:
+            body.extend(rnd.choice(words))
+        stream.extend(b"\0" * 32)
+        stream.extend(zlib.compress(bytes(body)))
+    return bytes(stream)
+
+
+def legacy_scan(stream, scan_range=0):
+    """get_more.scan 原实现（iter_content(chunk_size=1) + 每个候选位置整体解压）"""
+    def test(data):
+        try:
+            zlib.decompress(data[32:])
+            return True
+        except zlib.error:
+            return False
+
+    ids = []
+    header = bytearray()
+    pk_data = bytearray()
+    size = 0
+    offset = 0
+    status = False
+    for i in range(len(stream)):
+        chunk = stream[i:i + 1]
+        pk_data.extend(chunk)
+        if 32 <= size <= 33:
+            header.extend(chunk)
+        elif size > 33:
+            if chunk == struct.pack("B", header[0]):
+                status = True
+            elif chunk == struct.pack("B", header[1]):
+                if status:
+                    if size - 33 - offset < scan_range:
+                        status = False
+                    elif test(pk_data):
+                        ids.append((offset, size - 33 - offset))
+                        pk_data = pk_data[size - 33 - offset:]
+                        offset = size - 33
+                    else:
+                        status = False
+            else:
+                status = False
+        size += 1
+    if test(pk_data):
+        ids.append((offset, size - offset))
+    return ids
+
+
+def chunked_scan(stream, scan_range=0, chunk_size=1024 * 256):
+    scanner = ebt_scanner(scan_range)
+    ids = []
+    for i in range(0, len(stream), chunk_size):
+        ids += [page[:2] for page in scanner.feed(stream[i:i + chunk_size])]
+    page = scanner.finish()
+    if page:
+        ids.append(page[:2])
+    return ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--page-size", type=int, default=40000, help="每页解压后的字节数")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 256)
+    args = parser.parse_args()
+
+    stream = make_stream(args.pages, args.page_size)
+    print(f"stream: {args.pages} pages, {len(stream) / 1024:.1f} KiB")
+
+    start = time.perf_counter()
+    new = chunked_scan(stream, chunk_size=args.chunk_size)
+    new_cost = time.perf_counter() - start
+    print(f"chunked  {len(new):>5} pages  {new_cost:8.3f}s")
+
+    start = time.perf_counter()
+    old = legacy_scan(stream)
+    old_cost = time.perf_counter() - start
+    print(f"legacy   {len(old):>5} pages  {old_cost:8.3f}s")
+
+    print(f"speedup: {old_cost / new_cost:.1f}x, boundaries match: {old == new}")
+    if old != new:
+        os._exit(1)
@@ -0,0 +1,98 @@
+"""
+对比逐页启动 ffdec、常驻 ffdec 工作池与整目录单次导出的转换吞吐（页/秒）。
+--feed-interval 模拟 pipeline 的喂入方式：页面随下载完成逐页提交，每页间隔若干秒，
+工作池一行同时输出平均每次 ffdec 调用转换的页数。
+
+用法（需在 ffdec/ffdec.jar 所在目录下执行，swf 目录为 get_pdf 生成的 docs/<p_code>/swf/；
+PYTHONPATH 指向仓库根目录，使脚本能导入 spider_tools）：
+    PYTHONPATH=<仓库根目录> python <仓库根目录>/test/bench_ffdec_pool.py docs/<p_code>/swf --pages 50 --workers 5
+    PYTHONPATH=<仓库根目录> python <仓库根目录>/test/bench_ffdec_pool.py docs/<p_code>/swf --feed-interval 0.05
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from spider_tools.get_pdf import export_frames, ffdec, ffdec_pool
+
+
+def feed(pages, submit, interval):
+    for i in pages:
+        submit(i)
+        if interval:
+            time.sleep(interval)
+
+
+def per_page(pages, swf_dir, out_dir, workers, interval):
+    def execute(i):
+        dirpath = os.path.join(out_dir, str(i))
+        ffdec("-format", "frame:pdf", "-select", "1", "-export", "frame", dirpath, os.path.join(swf_dir, f"{i}.swf"))
+        if os.path.isfile(os.path.join(dirpath, "frames.pdf")):
+            shutil.move(os.path.join(dirpath, "frames.pdf"), os.path.join(out_dir, f"{i}.pdf"))
+        shutil.rmtree(dirpath, ignore_errors=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        feed(pages, lambda i: executor.submit(execute, i), interval)
+
+
+def pooled(pages, swf_dir, out_dir, workers, batch_size, linger, interval):
+    failed = []
+
+    def done(page, ok):
+        if not ok:
+            failed.append(page)
+
+    # 与 pipeline 一致：有界队列，逐页提交
+    pool = ffdec_pool("pdf", done, workers=workers, batch_size=batch_size, workdir=out_dir,
+                      maxsize=workers * 2, linger=linger)
+    feed(pages, lambda i: pool.submit(i, os.path.join(swf_dir, f"{i}.swf"), os.path.join(out_dir, f"{i}.pdf")),
+         interval)
+    pool.close()
+    print(f"{'':<10} {pool.stats['batches']} ffdec calls, {pool.stats['pages'] / max(1, pool.stats['batches']):.1f} "
+          f"pages per call")
+    return failed
+
+
+def whole_dir(pages, swf_dir, out_dir):
+    failed = []
+
+    def done(page, ok):
+        if not ok:
+            failed.append(page)
+
+    jobs = [(i, None, os.path.join(out_dir, f"{i}.pdf")) for i in pages]
+    export_frames("pdf", swf_dir, jobs, out_dir, done)
+    return failed
+
+
+def run(name, func, pages, *args):
+    out_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        start = time.perf_counter()
+        func(pages, args[0], out_dir, *args[1:])
+        cost = time.perf_counter() - start
+        converted = len([f for f in os.listdir(out_dir) if f.endswith(".pdf")])
+        print(f"{name:<10} {converted:>5} pages  {cost:8.2f}s  {converted / cost:8.2f} pages/s")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("swf_dir")
+    parser.add_argument("--pages", type=int, default=0, help="只测试前 N 页，0 表示全部")
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--linger", type=float, default=0.5, help="工作池凑批的最短等待（秒）")
+    parser.add_argument("--feed-interval", type=float, default=0, help="逐页提交的间隔（秒），0 表示一次性提交")
+    args = parser.parse_args()
+
+    pages = sorted(int(f[:-4]) for f in os.listdir(args.swf_dir) if f.endswith(".swf") and f[:-4].isdigit())
+    if args.pages:
+        pages = pages[:args.pages]
+    run("per-page", per_page, pages, args.swf_dir, args.workers, args.feed_interval)
+    run("pool", pooled, pages, args.swf_dir, args.workers, args.batch_size, args.linger, args.feed_interval)
+    if not args.pages:
+        run("batch", whole_dir, pages, args.swf_dir)
@@ -0,0 +1,128 @@
+"""
+在详情页语料上对比原实现与"解析一次、共用同一棵树"的吞吐（pages/s），并校验两者的提取结果一致。
+
+每页执行与 get_detail_data 相同的提取：collect_file_links（整页与按 class 过滤）、get_html、extract_item_content，
+以及 OSSManager.extract_and_replace_img_links 转 markdown 后的结果。
+- legacy：原实现，每个函数各自用 html.parser 解析一次，按 class 过滤时还会序列化后重新解析
+- shared：parse_html 解析一次，各函数共用同一棵树
+
+语料默认为 test/ 下的 html 文件加上合成的详情页，也可用 --corpus 指定目录。
+
+用法（在仓库根目录运行，PYTHONPATH=. 使脚本能导入 spider_tools）：
+    PYTHONPATH=. python test/bench_html_parser.py --pages 300
+    PYTHONPATH=. python test/bench_html_parser.py --corpus /data/detail_pages
+"""
+import argparse
+import glob
+import os
+import random
+import time
+
+import html2text
+from bs4 import BeautifulSoup
+
+from spider_tools.file_utils import (
+    collect_file_links,
+    extract_item_content,
+    get_html,
+    parse_html,
+    clean_name,
+)
+from spider_tools.oss_manager import OSSManager
+
+BASE_URL = "http://www.example.gov.cn"
+
+
+def make_page(rnd, index):
+    """合成一个政府采购/招标类详情页：正文段落、表格、附件链接、图片，夹杂常见的不规范写法"""
+    parts = [f"<div class='title'><h1>项目公告第{index}号</h1></div>", "<div class='detail'>"]
+    for i in range(rnd.randrange(20, 60)):
+        text = "".join(rnd.choice("采购项目预算金额供应商资格要求递交文件截止时间地点联系人电话") for _ in range(rnd.randrange(20, 120)))
+        if i % 7 == 3:
+            parts.append(f"<p>{text}&nbsp;<br>{text[:10]}")  # 未闭合的 p
+        else:
+            parts.append(f"<p style='text-indent:2em'><span>{text}</span></p>")
+    parts.append("<table><tr><th>序号</th><th>名称</th></tr>")
+    for i in range(rnd.randrange(3, 15)):
+        parts.append(f"<tr><td>{i}</td><td>货物{i}&amp;服务</td></tr>")
+    parts.append("</table>")
+    for i in range(rnd.randrange(1, 8)):
+        ext = rnd.choice(["pdf", "doc", "docx", "zip", "xls"])
+        parts.append(f"<a href='/upload/{index}_{i}.{ext}' title='附件{i}.{ext}'>附件{i}</a>")
+        parts.append(f"<img src='images/{index}_{i}.png' alt='图{i}'>")
+    parts.append("<a href='http://www.example.gov.cn/list.html'>返回列表</a>")
+    parts.append("</div><div class='footer'>主办单位：某某公共资源交易中心</div>")
+    return ("<!doctype html><html><head><meta charset='utf-8'><title>详情</title></head><body>"
+            + "".join(parts) + "</body></html>")
+
+
+def load_corpus(corpus_dir, pages, seed=0):
+    paths = glob.glob(os.path.join(corpus_dir or os.path.dirname(os.path.abspath(__file__)), "*.html"))
+    corpus = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            corpus.append(f.read())
+    if corpus_dir is None:
+        rnd = random.Random(seed)
+        corpus += [make_page(rnd, i) for i in range(pages)]
+    return corpus
+
+
+def legacy_collect(html_content, class_name=None):
+    """原 extract_file_names 的解析部分：按 class 过滤时序列化匹配元素后重新解析"""
+    soup = BeautifulSoup(html_content, "html.parser")
+    if class_name:
+        target_elements = soup.find_all(class_=class_name)
+        if not target_elements:
+            return []
+        soup = BeautifulSoup("".join(str(element) for element in target_elements), "html.parser")
+    return collect_file_links(soup, base_url=BASE_URL)
+
+
+def legacy(page):
+    return (
+        legacy_collect(page),
+        legacy_collect(page, "detail"),
+        get_html(BeautifulSoup(page, "html.parser"), "detail"),
+        extract_item_content(BeautifulSoup(page, "html.parser")),
+        html2text.HTML2Text().handle(OSSManager.extract_and_replace_img_links(None, page, BASE_URL)),
+    )
+
+
+def shared(page):
+    soup = parse_html(page)
+    result = (
+        collect_file_links(soup, base_url=BASE_URL),
+        collect_file_links(soup, "detail", base_url=BASE_URL),
+        get_html(soup, "detail"),
+        extract_item_content(soup),
+    )
+    # 替换图片链接会修改树，放在最后
+    return result + (html2text.HTML2Text().handle(OSSManager.extract_and_replace_img_links(None, soup, BASE_URL)),)
+
+
+def run(name, func, corpus):
+    start = time.perf_counter()
+    results = [func(page) for page in corpus]
+    cost = time.perf_counter() - start
+    print(f"{name:<12} {len(corpus):>6} pages  {cost:8.2f}s  {len(corpus) / cost:8.1f} pages/s")
+    return results, cost
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300, help="合成页面数（未指定 --corpus 时）")
+    parser.add_argument("--corpus", default=None, help="真实详情页 html 文件所在目录")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus, args.pages)
+    print(f"corpus: {len(corpus)} pages, {sum(map(len, corpus)) / 1024 / 1024:.1f} MiB")
+    # 预热 clean_name 等的导入与缓存
+    clean_name("warmup")
+
+    baseline, base_cost = run("legacy", legacy, corpus)
+    results, cost = run("shared", shared, corpus)
+    fields = ("links", "class links", "get_html", "item_content", "markdown")
+    mismatches = {field: sum(1 for old, new in zip(baseline, results) if old[i] != new[i])
+                  for i, field in enumerate(fields)}
+    print(f"{'':<12} speedup {base_cost / cost:.2f}x, mismatched pages: {mismatches}")
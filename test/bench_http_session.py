@@ -0,0 +1,78 @@
+"""
+在本地桩 HTTP 服务上对比逐请求 requests.get 与 http_pool 共享连接池的下载耗时和新建连接（握手）次数。
+
+桩服务使用 HTTP/1.1 keep-alive，每个新 TCP 连接计为一次握手；可用 --latency 模拟建连往返延迟。
+
+用法（在仓库根目录运行，PYTHONPATH=. 使脚本能导入 spider_tools）：
+    PYTHONPATH=. python test/bench_http_session.py --requests 500 --workers 10 --size 65536 --latency 0.02
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from spider_tools.get_pdf import cfg2, http_pool
+
+
+class stub_handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = b""
+    latency = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with stub_handler.lock:
+            stub_handler.connections += 1
+        # 模拟 TCP/TLS 握手的额外往返
+        time.sleep(self.latency)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run(name, get, url, count, workers):
+    stub_handler.connections = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(lambda i: len(get(f"{url}/getebt-{i}.ebt")), range(count)))
+    cost = time.perf_counter() - start
+    print(f"{name:<10} {count:>5} requests  {cost:8.2f}s  {count / cost:8.1f} req/s  "
+          f"{stub_handler.connections:>5} handshakes  {sum(sizes) / 1024 / 1024:.1f} MiB")
+    return cost, stub_handler.connections
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--size", type=int, default=64 * 1024, help="每个响应的字节数")
+    parser.add_argument("--latency", type=float, default=0.02, help="每次新建连接的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    stub_handler.body = b"\0" * args.size
+    stub_handler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), stub_handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    cfg2.download_workers = args.workers
+    try:
+        old_cost, old_conn = run("requests", lambda u: requests.get(u).content, url, args.requests, args.workers)
+        new_cost, new_conn = run("http_pool", http_pool.content, url, args.requests, args.workers)
+        print(f"speedup: {old_cost / new_cost:.2f}x, handshakes saved: {old_conn - new_conn}")
+    finally:
+        http_pool.close()
+        server.shutdown()
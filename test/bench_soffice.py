@@ -0,0 +1,82 @@
+"""
+对比 doc→docx 转换吞吐：每个文件冷启动一次 soffice（原 convert_doc_to_docx_from_url 的做法）与 OfficeConverter 常驻服务。
+
+样本默认由 soffice 把生成的文本文件批量转为 .doc 得到，也可用 --samples 指定一个 .doc 目录。
+需要本机安装 LibreOffice（或用 --soffice / 环境变量 SOFFICE_PATH 指定路径）。
+
+用法（在仓库根目录运行，PYTHONPATH=. 使脚本能导入 spider_tools）：
+    PYTHONPATH=. python test/bench_soffice.py --files 20 --workers 2
+    PYTHONPATH=. python test/bench_soffice.py --samples /data/docs --workers 4
+"""
+import argparse
+import glob
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from spider_tools.office_converter import OfficeConverter, find_soffice
+
+
+def make_samples(soffice, count, work_dir):
+    """生成 count 个内容不同的 .doc 样本"""
+    src_dir = os.path.join(work_dir, "src")
+    os.makedirs(src_dir)
+    for i in range(count):
+        lines = [f"第{i}号公告，第{j}段：采购项目预算金额与供应商资格要求。" for j in range(200)]
+        Path(src_dir, f"sample_{i}.txt").write_text("\n".join(lines), encoding="utf-8")
+    out_dir = os.path.join(work_dir, "doc")
+    subprocess.run([soffice, "--headless", "--convert-to", "doc:MS Word 97", "--outdir", out_dir]
+                   + sorted(glob.glob(os.path.join(src_dir, "*.txt"))),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True, timeout=600)
+    return [Path(path).read_bytes() for path in sorted(glob.glob(os.path.join(out_dir, "*.doc")))]
+
+
+def spawn_convert(soffice, content):
+    """原实现：写临时文件，冷启动 soffice --convert-to，读取结果"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_doc = Path(temp_dir) / "temp.doc"
+        temp_doc.write_bytes(content)
+        subprocess.run([soffice, "--headless", "--convert-to", "docx", "--outdir", temp_dir, str(temp_doc)],
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120, check=True)
+        return (Path(temp_dir) / "temp.docx").read_bytes()
+
+
+def run(name, convert, docs, workers=1):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(convert, docs))
+    cost = time.perf_counter() - start
+    print(f"{name:<26} {len(docs):>4} files  {cost:8.2f}s  {len(docs) / cost:6.2f} files/s  "
+          f"{sum(map(len, results)) / 1024:.0f} KiB out")
+    return cost
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=2, help="OfficeConverter 实例数")
+    parser.add_argument("--samples", default=None, help=".doc 样本目录")
+    parser.add_argument("--soffice", default=None)
+    args = parser.parse_args()
+
+    soffice = find_soffice(args.soffice)
+    with tempfile.TemporaryDirectory() as work_dir:
+        if args.samples:
+            docs = [Path(path).read_bytes() for path in sorted(glob.glob(os.path.join(args.samples, "*.doc")))]
+        else:
+            docs = make_samples(soffice, args.files, work_dir)
+        print(f"soffice: {soffice}, samples: {len(docs)}")
+
+        # 原实现共用默认配置目录，并发启动会互相阻塞，只能串行
+        old_cost = run("spawn per file", lambda doc: spawn_convert(soffice, doc), docs)
+        converter = OfficeConverter(soffice, workers=args.workers)
+        try:
+            mode = "uno" if converter.use_uno else "spawn"
+            new_cost = run(f"OfficeConverter({mode}, {args.workers})", converter.convert, docs,
+                           workers=args.workers * 2)
+            print(f"speedup: {old_cost / new_cost:.2f}x, stats: {converter.stats}")
+        finally:
+            converter.close()
@@ -0,0 +1,122 @@
+"""iter_archive / process_archive 的大小限制"""
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import tracemalloc
+import zipfile
+
+import pytest
+from loguru import logger
+
+from spider_tools import file_utils
+from spider_tools.file_utils import ArchiveLimitError, iter_archive, process_archive
+
+
+def test_member_limit_enforced_while_decompressing():
+    # 65 KB 的 gz 解压后 64 MB，声明大小未知，只能在读取时拦截
+    bomb = gzip.compress(b"a" * 64 * 1024 * 1024)
+    tracemalloc.start()
+    try:
+        with pytest.raises(ArchiveLimitError):
+            for member in iter_archive(bomb, "bomb.bin.gz", "gz", max_member_size=1024 * 1024):
+                member.read()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 1024 * 1024
+
+
+def test_member_within_limit():
+    data = b"a" * 100_000
+    members = [(m.name, m.read()) for m in iter_archive(gzip.compress(data), "a.txt.gz", "gz",
+                                                        max_member_size=len(data))]
+    assert members == [("a.txt/a.txt", data)]
+
+
+def make_zip(members, compression=zipfile.ZIP_STORED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as zf:
+        for name, data in members:
+            zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_total_size_shared_across_nested_archives():
+    inner = make_zip([("a.txt", b"a" * 900)], zipfile.ZIP_DEFLATED)
+    outer = make_zip([("inner.zip", inner), ("b.txt", b"b" * 900)])
+    files = process_archive(outer, "outer.zip", "zip", max_total_size=1200)
+    assert sum(len(content) for content, _ in files) <= 1200
+    assert [content for content, _ in files] == [b"a" * 900]
+
+
+def test_nested_archive_within_budget():
+    inner = make_zip([("a.txt", b"a" * 900)], zipfile.ZIP_DEFLATED)
+    outer = make_zip([("inner.zip", inner), ("b.txt", b"b" * 900)])
+    files = process_archive(outer, "outer.zip", "zip")
+    assert [content for content, _ in files] == [b"a" * 900, b"b" * 900]
+
+
+def make_7z(members):
+    py7zr = pytest.importorskip("py7zr")
+    buffer = io.BytesIO()
+    with py7zr.SevenZipFile(buffer, 'w') as archive:
+        for name, data in members:
+            archive.writestr(data, name)
+    return buffer.getvalue()
+
+
+def test_7z_filters_before_extracting(tmp_path, monkeypatch):
+    archive = make_7z([("a.pdf", b"a" * 100), ("b.txt", b"b" * 100), ("c.pdf", b"c" * 5000)])
+    extracted = []
+    original = tempfile.TemporaryDirectory
+
+    def tracking(*args, **kwargs):
+        temp_dir = original(*args, **kwargs)
+        extracted.append(temp_dir.name)
+        return temp_dir
+
+    monkeypatch.setattr(tempfile, "TemporaryDirectory", tracking)
+    names = []
+    for member in iter_archive(archive, "x.7z", "7z", extensions={"pdf"}, max_member_size=1000):
+        names.append(member.name)
+        names.append(sorted(os.listdir(extracted[0])))
+    assert names == ["x/a.pdf", ["a.pdf"]]
+
+
+def test_7z_without_py7zr_kept_as_file(monkeypatch):
+    archive = make_7z([("a.txt", b"a" * 100)])
+    monkeypatch.setattr(file_utils, "PY7ZR_AVAILABLE", False)
+    assert process_archive(archive, "x.7z", "7z") == [(archive, "x.7z")]
+
+
+def corrupt_member(archive, data):
+    # 改动成员数据的一个字节，读取时 CRC 校验失败
+    index = archive.index(data)
+    return archive[:index] + b"x" + archive[index + 1:]
+
+
+def test_nested_failure_returns_inner_archive_once():
+    inner = corrupt_member(make_zip([("a.txt", b"a" * 500), ("c.txt", b"c" * 100)]), b"c" * 100)
+    outer = make_zip([("inner.zip", inner), ("b.txt", b"b" * 900)])
+    # 额度只够 inner.zip 本身加 b.txt：已读出的 a.txt 不能留在结果里，也不能继续占用额度
+    files = process_archive(outer, "outer.zip", "zip", max_total_size=len(inner) + 900)
+    assert [content for content, _ in files] == [inner, b"b" * 900]
+    assert files[0][1].endswith(".zip")
+
+
+def test_plain_tar_not_reported_as_mismatch():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w') as tar:
+        info = tarfile.TarInfo("a.txt")
+        info.size = 3
+        tar.addfile(info, io.BytesIO(b"abc"))
+    messages = []
+    handler = logger.add(messages.append, format="{message}")
+    try:
+        members = [(m.name, m.read()) for m in iter_archive(buffer.getvalue(), "x.tar", "tar")]
+    finally:
+        logger.remove(handler)
+    assert members == [("x/a.txt", b"abc")]
+    assert not any("实际格式" in message for message in messages)
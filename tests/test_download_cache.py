@@ -0,0 +1,38 @@
+"""ConversionCache / DownloadCache(ttl=None)"""
+from spider_tools.download_cache import ConversionCache, DownloadCache, cached_convert
+
+
+def test_ttl_none_never_expires(tmp_path):
+    cache = DownloadCache(str(tmp_path), ttl=None)
+    cache.store("http://example.com/a", b"a" * 10, {})
+    entry, fresh = cache.lookup("http://example.com/a")
+    assert fresh
+    cache.store("http://example.com/b", b"b" * 10, {'Cache-Control': 'max-age=0'})
+    assert cache.lookup("http://example.com/b")[1] is False
+
+
+def test_cached_convert_hits(tmp_path):
+    cache = ConversionCache(str(tmp_path))
+    calls = []
+
+    def convert():
+        calls.append(1)
+        return b"docx"
+
+    assert cached_convert(b"doc", "docx:test", convert, cache=cache) == b"docx"
+    assert cached_convert(b"doc", "docx:test", convert, cache=cache) == b"docx"
+    # 不同转换方式分开存放
+    assert cached_convert(b"doc", "docx:other", convert, cache=cache) == b"docx"
+    assert len(calls) == 2
+    assert cache.hit_rate() == round(1 / 3, 4)
+    assert cache.stats()['hit_rate'] == cache.hit_rate()
+
+
+def test_conversion_cache_evicts_by_size(tmp_path):
+    cache = ConversionCache(str(tmp_path), max_size=1000)
+    for i in range(10):
+        cache.save(f"{i:032x}", "docx:test", bytes([i]) * 300)
+    stats = cache.stats()
+    assert stats['size'] <= 1000
+    assert cache.load(f"{9:032x}", "docx:test") == bytes([9]) * 300
+    assert cache.load(f"{0:032x}", "docx:test") is None
@@ -0,0 +1,33 @@
+"""extract_file_names 并发探测：单主机并发上限在提交前生效"""
+import threading
+import time
+
+from spider_tools import file_utils
+
+
+def test_slow_host_does_not_starve_others(monkeypatch):
+    running = {}
+    peak = {}
+    finished = {}
+    lock = threading.Lock()
+
+    def probe(href, file_name, timeout=30):
+        host = href.split('/')[2]
+        with lock:
+            running[host] = running.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), running[host])
+        time.sleep(0.5 if host == 'slow' else 0.05)
+        with lock:
+            running[host] -= 1
+            finished[host] = time.monotonic()
+        return True
+
+    monkeypatch.setattr(file_utils, "probe_file_link", probe)
+    links = [f'<a href="http://slow/{i}">下载{i}</a>' for i in range(8)]
+    links += [f'<a href="http://fast/{i}">下载{i}</a>' for i in range(8)]
+    start = time.monotonic()
+    files = file_utils.extract_file_names("".join(links), max_workers=4, per_host=2)
+    assert [f['href'] for f in files] == [f"http://slow/{i}" for i in range(8)] + [f"http://fast/{i}" for i in range(8)]
+    assert peak == {'slow': 2, 'fast': 2}
+    # 慢主机 8 个链接、并发 2，约 2 秒；快主机用另外两个线程并行探测，不排在慢主机后面
+    assert finished['fast'] - start < 1
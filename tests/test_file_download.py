@@ -0,0 +1,151 @@
+"""FileDownloader / AsyncFileDownloader 断点续传：用本地 HTTP 服务模拟 Range / If-Range / 416"""
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from spider_tools.async_file_download import AsyncFileDownloader
+from spider_tools.file_download import FileDownloader
+
+BODY = os.urandom(200_000)
+
+
+class Handler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        range_header = self.headers.get('Range')
+        self.requests_seen.append(range_header)
+        if range_header and self.headers.get('If-Range') in (None, self.etag):
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(BODY):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(BODY)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+            body = BODY[start:]
+        else:
+            self.send_response(200)
+            body = BODY
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    Handler.requests_seen = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/file.pdf"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def write_part(save_path, url, data, etag, length=None):
+    with open(save_path + ".part", 'wb') as f:
+        f.write(data)
+    with open(save_path + ".part.json", 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'etag': etag, 'last_modified': None, 'length': length}, f)
+
+
+def download(url, tmp_path):
+    ok, path = FileDownloader(retry_delay=0).download(url, save_dir=str(tmp_path), file_name="file.pdf")
+    assert ok
+    with open(path, 'rb') as f:
+        assert f.read() == BODY
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_resume_from_part(server, tmp_path):
+    write_part(str(tmp_path / "file.pdf"), server, BODY[:50_000], '"v1"', len(BODY))
+    download(server, tmp_path)
+    assert Handler.requests_seen == ["bytes=50000-"]
+
+
+def test_if_range_mismatch_restarts(server, tmp_path):
+    write_part(str(tmp_path / "file.pdf"), server, b"x" * 50_000, '"old"', len(BODY))
+    download(server, tmp_path)
+    assert Handler.requests_seen == ["bytes=50000-"]
+
+
+def test_complete_part_with_known_length(server, tmp_path):
+    write_part(str(tmp_path / "file.pdf"), server, BODY, '"v1"', len(BODY))
+    download(server, tmp_path)
+    assert Handler.requests_seen == []
+
+
+def test_complete_part_416(server, tmp_path):
+    write_part(str(tmp_path / "file.pdf"), server, BODY, '"v1"')
+    download(server, tmp_path)
+    assert Handler.requests_seen == [f"bytes={len(BODY)}-"]
+
+
+def test_existing_file_require_pdf(tmp_path):
+    downloader = FileDownloader()
+    url = "http://127.0.0.1:1/file.pdf"
+    (tmp_path / "file.pdf").write_bytes(b"<html>" + b" " * 2000 + b"</html>")
+    assert downloader.download(url, save_dir=str(tmp_path), file_name="file.pdf", require_pdf=True) == (False, None)
+    (tmp_path / "file.pdf").write_bytes(b"%PDF-1.4" + b" " * 2000)
+    ok, path = downloader.download(url, save_dir=str(tmp_path), file_name="file.pdf", require_pdf=True)
+    assert ok and path == str(tmp_path / "file.pdf")
+
+
+def download_async(url, tmp_path, **kwargs):
+    async def run():
+        async with AsyncFileDownloader(retry_delay=0) as downloader:
+            return await downloader.download(url, save_dir=str(tmp_path), file_name="file.pdf", **kwargs)
+    return asyncio.run(run())
+
+
+def test_async_resume_from_part(server, tmp_path):
+    write_part(str(tmp_path / "file.pdf"), server, BODY[:50_000], '"v1"', len(BODY))
+    ok, path = download_async(server, tmp_path)
+    assert ok and open(path, 'rb').read() == BODY
+    assert Handler.requests_seen == ["bytes=50000-"]
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_async_complete_part_416(server, tmp_path):
+    write_part(str(tmp_path / "file.pdf"), server, BODY, '"v1"')
+    ok, path = download_async(server, tmp_path)
+    assert ok and open(path, 'rb').read() == BODY
+    assert Handler.requests_seen == [f"bytes={len(BODY)}-"]
+
+
+def test_async_require_pdf_checks_stream(server, tmp_path):
+    # BODY 是随机字节、响应没有 Content-Type，第一个分块就判定不是 PDF，只发一次 GET、不重试
+    assert download_async(server, tmp_path, require_pdf=True) == (False, None)
+    assert Handler.requests_seen == [None]
+    assert not os.path.exists(str(tmp_path / "file.pdf.part"))
+
+
+def test_async_download_many(server, tmp_path):
+    urls = [(server, f"{i}.pdf") for i in range(5)]
+    (tmp_path / "0.pdf").write_bytes(BODY)
+
+    async def run():
+        async with AsyncFileDownloader(retry_delay=0) as downloader:
+            batch = downloader.download_many(urls, save_dir=str(tmp_path), per_host=2)
+            with pytest.raises(TypeError):
+                iter(batch)
+            return [result async for result in batch], batch.stats
+
+    results, stats = asyncio.run(run())
+    assert sorted(os.path.basename(r['path']) for r in results) == [f"{i}.pdf" for i in range(5)]
+    assert (stats['succeeded'], stats['skipped'], stats['failed']) == (4, 1, 0)
+    assert stats['bytes'] == 5 * len(BODY)
+    assert len(Handler.requests_seen) == 4
@@ -0,0 +1,31 @@
+"""OfficeConverter 重启限制：按时间窗口计数，长时间运行不会永久停用"""
+import pytest
+
+from spider_tools import office_converter
+from spider_tools.office_converter import OfficeConverter
+
+
+class Instance:
+    def __init__(self):
+        self.starts = 0
+
+    def stop(self):
+        pass
+
+    def start(self):
+        self.starts += 1
+
+
+def test_restart_limit_is_per_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(office_converter.time, "monotonic", lambda: now[0])
+    converter = OfficeConverter(soffice_path="soffice", max_restarts=2, restart_window=60)
+    instance = Instance()
+    converter._restart(instance)
+    converter._restart(instance)
+    with pytest.raises(RuntimeError):
+        converter._restart(instance)
+    now[0] += 61
+    converter._restart(instance)
+    assert instance.starts == 3
+    assert converter.stats['restarts'] == 3